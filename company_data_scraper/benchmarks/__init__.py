@@ -0,0 +1,14 @@
+# Offline benchmarks for the scraping system. Run from the scrapy project
+# directory (the one holding scrapy.cfg):
+#
+#   python -m benchmarks.run all -o benchmark_results.json
+#   python -m benchmarks.run compare old.json new.json
+#
+# Nothing here touches the network: pages come from fixtures/ and the crawl
+# benchmark runs against benchmarks.standin_server on 127.0.0.1.
+import os
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(PROJECT_DIR, 'fixtures')
+COMPANY_PAGES_DIR = os.path.join(FIXTURES_DIR, 'company_pages')
+DIRECTORY_PAGES_DIR = os.path.join(FIXTURES_DIR, 'directory_pages')
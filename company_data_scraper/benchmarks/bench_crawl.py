@@ -0,0 +1,136 @@
+# bench_crawl.py
+#
+# (d) End-to-end profile crawl against benchmarks.standin_server: a real
+# `scrapy crawl company_profile_scraper` in a scratch directory, with every
+# linkedin.com request rewritten to the local stand-in. With
+# `refresh_change_rate`, a share of the pages then changes and a second
+# `-a refresh=1` crawl re-checks every company in the same directory. With
+# `workers` > 1 the crawl is sharded: that many processes lease URLs from one
+# work queue, and their outputs are merged afterwards.
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import PROJECT_DIR
+from benchmarks.standin_server import StandinServer
+
+
+def run(companies=500, concurrency=16, latency_ms=20.0, rate_404=0.02, rate_redirect=0.05,
+        rate_429=0.02, extra_settings=None, refresh_change_rate=None, workers=1):
+    from company_data_scraper import settings as project_settings
+    from company_data_scraper.storage import iter_records
+
+    server = StandinServer(latency_ms=latency_ms, rate_404=rate_404, rate_redirect=rate_redirect,
+                           rate_429=rate_429, retry_after=0).start()
+    settings = {
+        'STANDIN_URL': server.base_url,
+        'DOWNLOADER_MIDDLEWARES': json.dumps(dict(project_settings.DOWNLOADER_MIDDLEWARES, **{
+            'benchmarks.standin_server.RewriteToStandinMiddleware': 50,
+        })),
+        'DOWNLOAD_DELAY': 0,
+        'RATE_BUDGET_RPS': 0,
+        'RETRY_QUEUE_BASE_DELAY': 0.5,   # retry-later pass within the run, without minutes of backoff
+        'CONCURRENT_REQUESTS': concurrency,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': concurrency,
+        'CONCURRENT_REQUESTS_PER_IP': concurrency,
+        'LOG_LEVEL': 'ERROR',
+    }
+    if refresh_change_rate is not None:
+        settings['REFRESH_INITIAL_DAYS'] = 0  # every page is due again right away
+    settings.update(extra_settings or {})
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            with open(os.path.join(workdir, 'company_ids.csv'), 'w') as f:
+                for i in range(companies):
+                    f.write(f'"bench-company-{i}"\n')
+            if workers > 1:
+                proc, elapsed, records_before_merge = _sharded_crawl(workdir, settings, workers)
+            else:
+                proc, elapsed = _crawl(workdir, settings)
+            items = sum(1 for _ in iter_records(os.path.join(workdir, 'company_profile_data')))
+            requests = sum(server.status_counts.values())
+            status_counts = dict(server.status_counts)
+            if refresh_change_rate is not None:
+                server.change_pages(refresh_change_rate)
+                server.status_counts.clear()
+                refresh_proc, refresh_elapsed = _crawl(workdir, settings, ['-a', 'refresh=1'])
+                refresh = {
+                    'change_rate': refresh_change_rate,
+                    'returncode': refresh_proc.returncode,
+                    'seconds': refresh_elapsed,
+                    'items_written': sum(1 for _ in iter_records(os.path.join(workdir, 'company_profile_data'))) - items,
+                    'requests': sum(server.status_counts.values()),
+                    'status_counts': {str(status): count for status, count in sorted(server.status_counts.items())},
+                    'seconds_vs_full_crawl': refresh_elapsed / elapsed,
+                }
+    finally:
+        server.stop()
+
+    result = {
+        'companies': companies,
+        'concurrency': concurrency,
+        'latency_ms': latency_ms,
+        'rates': {'404': rate_404, 'redirect': rate_redirect, '429': rate_429},
+        'returncode': proc.returncode,
+        'seconds': elapsed,
+        'items': items,
+        'items_per_second': items / elapsed,
+        'requests': requests,
+        'requests_per_second': requests / elapsed,
+        'status_counts': {str(status): count for status, count in sorted(status_counts.items())},
+        'stderr_tail': proc.stderr.strip().splitlines()[-5:] if proc.returncode else [],
+    }
+    if workers > 1:
+        result['workers'] = workers
+        result['records_before_merge'] = records_before_merge
+    if refresh_change_rate is not None:
+        result['refresh'] = refresh
+    return result
+
+
+def _scrapy(arguments, settings=None):
+    command = [sys.executable, '-m', 'scrapy', *arguments]
+    for name, value in (settings or {}).items():
+        command += ['-s', f'{name}={value}']
+    env = dict(os.environ, SCRAPY_SETTINGS_MODULE='company_data_scraper.settings',
+               PYTHONPATH=os.pathsep.join(filter(None, [PROJECT_DIR, os.environ.get('PYTHONPATH')])))
+    return command, env
+
+
+def _crawl(workdir, settings, arguments=()):
+    command, env = _scrapy(['crawl', 'company_profile_scraper', *arguments], settings)
+    start = time.perf_counter()
+    proc = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+    return proc, time.perf_counter() - start
+
+
+def _sharded_crawl(workdir, settings, workers):
+    from company_data_scraper.storage import iter_records
+
+    start = time.perf_counter()
+    command, env = _scrapy(['work_queue', 'init', '--shards', str(workers)])
+    subprocess.run(command, cwd=workdir, env=env, check=True, capture_output=True)
+    procs = []
+    for worker in range(workers):
+        worker_settings = dict(settings, PROFILE_OUTPUT_DIR=f'worker-{worker}',
+                               SCRAPED_INDEX_PATH=f'worker-{worker}.sqlite3',
+                               RETRY_QUEUE_PATH=f'worker-{worker}-retries.sqlite3')
+        command, env = _scrapy(['crawl', 'company_profile_scraper', '-a', 'work_queue=work_queue.sqlite3'],
+                               worker_settings)
+        procs.append(subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL,
+                                      stderr=subprocess.PIPE, text=True))
+    failed = None
+    for proc in procs:
+        proc.stderr_text = proc.communicate()[1]
+        if proc.returncode and failed is None:
+            failed = proc
+    records = sum(1 for worker in range(workers)
+                  for _ in iter_records(os.path.join(workdir, f'worker-{worker}')))
+    command, env = _scrapy(['merge_output', *[f'worker-{worker}' for worker in range(workers)]])
+    subprocess.run(command, cwd=workdir, env=env, check=True, capture_output=True)
+    elapsed = time.perf_counter() - start
+    proc = failed or procs[0]
+    return subprocess.CompletedProcess(proc.args, proc.returncode, '', proc.stderr_text), elapsed, records
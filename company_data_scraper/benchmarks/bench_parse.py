@@ -0,0 +1,74 @@
+# bench_parse.py
+#
+# (a) Parse throughput of the profile extraction and of the directory
+# spider's listing extraction over the fixture corpus. The profile output is
+# checked against fixtures/company_pages_expected.json before timing.
+import glob
+import json
+import os
+import time
+
+from scrapy.http import HtmlResponse, Request
+
+from benchmarks import COMPANY_PAGES_DIR, DIRECTORY_PAGES_DIR, FIXTURES_DIR
+from company_data_scraper.extraction import extract_company_profile
+from company_data_scraper.inputs import DigestSet
+from company_data_scraper.spiders.linkedin_directory_scraper import LinkedinDirectoryScraperSpider
+
+
+def _profile_url(page):
+    return 'https://www.linkedin.com/company/' + page[:-len('.html')] + '/?trk=companies_directory'
+
+
+def check_profiles():
+    """Returns the fixture pages whose extracted item differs from the expected one."""
+    with open(os.path.join(FIXTURES_DIR, 'company_pages_expected.json')) as f:
+        expected = json.load(f)
+    mismatches = []
+    for entry in expected:
+        with open(os.path.join(COMPANY_PAGES_DIR, entry['page']), 'rb') as f:
+            item = extract_company_profile(f.read(), _profile_url(entry['page']))
+        if item != entry['item'] or (item and list(item) != list(entry['item'])):
+            mismatches.append(entry['page'])
+    return mismatches
+
+
+def _time_pages(func, pages, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for page in pages:
+            func(page)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        'pages': len(pages),
+        'best_seconds': best,
+        'pages_per_second': len(pages) / best,
+        'us_per_page': best / len(pages) * 1e6,
+        'mb_per_second': sum(len(body) for _, body in pages) / best / 1e6,
+    }
+
+
+def run(repeat=5):
+    company_pages = [(os.path.basename(path), open(path, 'rb').read())
+                     for path in sorted(glob.glob(os.path.join(COMPANY_PAGES_DIR, '*.html')))]
+    directory_pages = [(os.path.basename(path), open(path, 'rb').read())
+                       for path in sorted(glob.glob(os.path.join(DIRECTORY_PAGES_DIR, '*.html')))]
+
+    mismatches = check_profiles()
+    results = {'profile_mismatches': mismatches}
+    results['profile'] = _time_pages(
+        lambda page: extract_company_profile(page[1], _profile_url(page[0])), company_pages, repeat)
+
+    spider = LinkedinDirectoryScraperSpider()
+
+    def parse_directory(page):
+        url = 'https://www.linkedin.com/directory/companies/' + page[0]
+        response = HtmlResponse(url=url, body=page[1], encoding='utf-8', request=Request(url))
+        spider.seen_slugs = DigestSet()  # every round parses the pages as new
+        for _ in spider.parse(response):
+            pass
+
+    results['directory'] = _time_pages(parse_directory, directory_pages, repeat)
+    return results
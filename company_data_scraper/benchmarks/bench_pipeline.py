@@ -0,0 +1,105 @@
+# bench_pipeline.py
+#
+# (b) Write throughput and peak RSS of CompanyProfilePipeline. Every
+# (mode, size) pair runs in its own interpreter so peak RSS is not shared:
+#
+#   python -m benchmarks.bench_pipeline --items 100000 --mode jsonl
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import FIXTURES_DIR, PROJECT_DIR
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _template_items():
+    with open(os.path.join(FIXTURES_DIR, 'company_pages_expected.json')) as f:
+        return [entry['item'] for entry in json.load(f) if entry['item']]
+
+
+def measure(items, mode, workdir):
+    from scrapy.settings import Settings
+    from scrapy.signalmanager import SignalManager
+
+    from company_data_scraper import settings as project_settings
+    from company_data_scraper.items import CompanyProfileItem
+    from company_data_scraper.pipelines import CompanyProfilePipeline
+
+    settings = Settings()
+    settings.setmodule(project_settings)
+    settings.set('PROFILE_OUTPUT_MODE', mode)
+    settings.set('PROFILE_OUTPUT_FILE', os.path.join(workdir, 'company_profile_data.json'))
+    settings.set('PROFILE_OUTPUT_DIR', os.path.join(workdir, 'company_profile_data'))
+    settings.set('SCRAPED_INDEX_PATH', os.path.join(workdir, 'scraped_index.sqlite3'))
+
+    class Crawler:
+        pass
+
+    crawler = Crawler()
+    crawler.settings = settings
+    crawler.signals = SignalManager(crawler)
+    templates = _template_items()
+    rss_before = _peak_rss_mb()
+
+    start = time.perf_counter()
+    pipeline = CompanyProfilePipeline.from_crawler(crawler)
+    pipeline.open_spider(None)
+    for i in range(items):
+        item = dict(templates[i % len(templates)])
+        item['company_url'] = f'https://www.linkedin.com/company/bench-{i}/?trk=companies_directory'
+        pipeline.process_item(CompanyProfileItem.from_profile(item), None)
+    write_done = time.perf_counter()
+    pipeline.close_spider(None)
+    end = time.perf_counter()
+
+    output_bytes = 0
+    for root, _dirs, files in os.walk(workdir):
+        output_bytes += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return {
+        'mode': mode,
+        'items': items,
+        'seconds': end - start,
+        'items_per_second': items / (end - start),
+        'us_per_item': (write_done - start) / items * 1e6,
+        'close_seconds': end - write_done,
+        'peak_rss_mb': _peak_rss_mb(),
+        'rss_growth_mb': _peak_rss_mb() - rss_before,
+        'output_mb': output_bytes / 1e6,
+    }
+
+
+def run(sizes=(10_000, 100_000, 1_000_000), modes=('jsonl', 'json')):
+    results = []
+    for mode in modes:
+        for size in sizes:
+            proc = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_pipeline', '--items', str(size), '--mode', mode],
+                cwd=PROJECT_DIR, capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                results.append({'mode': mode, 'items': size, 'error': proc.stderr.strip().splitlines()[-1:]})
+                continue
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure one CompanyProfilePipeline run')
+    parser.add_argument('--items', type=int, required=True)
+    parser.add_argument('--mode', default='jsonl')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        print(json.dumps(measure(args.items, args.mode, workdir)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# bench_startup.py
+#
+# (c) Profile spider startup with the real company_ids.csv: time until the
+# first request is handed to Scrapy, and until all start requests have been
+# produced. Runs cold (empty scraped index) and warm (half the inputs
+# already scraped), each in a scratch directory so no real state is used.
+import io
+import os
+import shutil
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from benchmarks import PROJECT_DIR
+
+
+def _measure(settings):
+    from scrapy.crawler import Crawler
+
+    from company_data_scraper.spiders.company_profile_scraper import CompanyProfileScraperSpider
+
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        spider = CompanyProfileScraperSpider.from_crawler(Crawler(CompanyProfileScraperSpider, settings))
+        requests = iter(spider.start_requests())
+        first = next(requests, None)
+        first_request = time.perf_counter() - start
+        count = 1 if first is not None else 0
+        for _ in requests:
+            count += 1
+        all_requests = time.perf_counter() - start
+        spider.closed('finished')
+    return {'first_request_seconds': first_request, 'all_requests_seconds': all_requests, 'requests': count}
+
+
+def run():
+    from scrapy.settings import Settings
+
+    from company_data_scraper import settings as project_settings
+    from company_data_scraper.index import ScrapedUrlIndex
+    from company_data_scraper.inputs import iter_input_urls
+
+    input_file = os.path.join(PROJECT_DIR, 'company_ids.csv')
+    results = {}
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp()
+    try:
+        os.chdir(workdir)
+        shutil.copy(input_file, 'company_ids.csv')
+        settings = Settings()
+        settings.setmodule(project_settings)
+        results['cold'] = _measure(settings.copy())
+
+        os.remove(settings['INPUT_CURSOR_PATH'])
+        index = ScrapedUrlIndex(settings['SCRAPED_INDEX_PATH'])
+        for i, (url, _start, _end) in enumerate(iter_input_urls('company_ids.csv')):
+            if i % 2 == 0:
+                index.add(url)
+        index.close()
+        results['warm'] = _measure(settings.copy())
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+    return results
@@ -0,0 +1,119 @@
+# run.py
+#
+#   python -m benchmarks.run [parse|pipeline|startup|crawl|all] [-o results.json]
+#   python -m benchmarks.run compare old.json new.json
+#
+# Results are written as JSON, tagged with the git commit they were measured
+# on, so two runs can be compared with `compare`.
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from benchmarks import PROJECT_DIR
+
+SUITES = ('parse', 'pipeline', 'startup', 'crawl')
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suites(suites, args):
+    results = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+        },
+    }
+    if 'parse' in suites:
+        from benchmarks import bench_parse
+        results['parse'] = bench_parse.run(repeat=args.repeat)
+    if 'pipeline' in suites:
+        from benchmarks import bench_pipeline
+        results['pipeline'] = bench_pipeline.run(sizes=args.sizes, modes=args.modes)
+    if 'startup' in suites:
+        from benchmarks import bench_startup
+        results['startup'] = bench_startup.run()
+    if 'crawl' in suites:
+        from benchmarks import bench_crawl
+        results['crawl'] = bench_crawl.run(
+            companies=args.companies, concurrency=args.concurrency, latency_ms=args.latency_ms,
+            rate_404=args.rate_404, rate_redirect=args.rate_redirect, rate_429=args.rate_429,
+            extra_settings={'RATE_BUDGET_RPS': args.rate_budget,
+                            'EXTRACTION_WORKERS': args.extraction_workers,
+                            'EXTRACTION_EXECUTOR': args.extraction_executor},
+            refresh_change_rate=args.refresh_change_rate, workers=args.workers,
+        )
+    return results
+
+
+def _flatten(value, prefix=''):
+    if isinstance(value, dict):
+        for key, sub in value.items():
+            yield from _flatten(sub, f'{prefix}{key}.')
+    elif isinstance(value, list):
+        for i, sub in enumerate(value):
+            label = f"{sub.get('mode')}-{sub.get('items')}" if isinstance(sub, dict) and 'items' in sub else str(i)
+            yield from _flatten(sub, f'{prefix}{label}.')
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix[:-1], value
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = dict(_flatten({k: v for k, v in json.load(f).items() if k != 'meta'}))
+    with open(new_path) as f:
+        new = dict(_flatten({k: v for k, v in json.load(f).items() if k != 'meta'}))
+    for key in sorted(old.keys() & new.keys()):
+        if old[key]:
+            print(f'{key:60s} {old[key]:>14.4g} -> {new[key]:>14.4g}  ({new[key] / old[key]:.2f}x)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks for the company scrapers')
+    parser.add_argument('suite', choices=SUITES + ('all', 'compare'))
+    parser.add_argument('files', nargs='*', help='for compare: OLD.json NEW.json')
+    parser.add_argument('-o', '--output', default='benchmark_results.json')
+    parser.add_argument('--repeat', type=int, default=5, help='parse: timing rounds (best is kept)')
+    parser.add_argument('--sizes', type=lambda v: [int(x) for x in v.split(',')], default=[10_000, 100_000, 1_000_000],
+                        help='pipeline: comma-separated item counts')
+    parser.add_argument('--modes', type=lambda v: v.split(','), default=['jsonl', 'json'],
+                        help='pipeline: comma-separated PROFILE_OUTPUT_MODE values')
+    parser.add_argument('--companies', type=int, default=1000, help='crawl: number of company pages')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--rate-404', type=float, default=0.02)
+    parser.add_argument('--rate-redirect', type=float, default=0.05)
+    parser.add_argument('--rate-429', type=float, default=0.02)
+    parser.add_argument('--rate-budget', type=float, default=0, help='crawl: RATE_BUDGET_RPS (0 = unlimited)')
+    parser.add_argument('--workers', type=int, default=1, help='crawl: sharded crawl with this many processes')
+    parser.add_argument('--refresh-change-rate', type=float, default=None,
+                        help='crawl: also time a refresh crawl after this share of pages changed')
+    parser.add_argument('--extraction-workers', type=int, default=0, help='crawl: EXTRACTION_WORKERS')
+    parser.add_argument('--extraction-executor', default='process', help='crawl: EXTRACTION_EXECUTOR')
+    args = parser.parse_args()
+
+    if args.suite == 'compare':
+        if len(args.files) != 2:
+            parser.error('compare needs OLD.json NEW.json')
+        compare(*args.files)
+        return
+
+    suites = SUITES if args.suite == 'all' else (args.suite,)
+    results = run_suites(suites, args)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=4)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+# standin_server.py
+#
+# Local HTTP stand-in for linkedin.com that serves the fixture pages.
+#
+# `/company/<slug>/` returns one of fixtures/company_pages (picked by slug)
+# and `/directory/companies/<letter>` one of fixtures/directory_pages. Each
+# request can be delayed, and a configurable share of them answered with a
+# 404, a 302 to the same page, or a 429 with Retry-After. Outcomes are drawn
+# from a seeded RNG per (path, attempt), so runs are reproducible.
+# Pages carry an ETag and answer If-None-Match with a 304; `change_pages()`
+# gives a share of the companies a new revision, for refresh crawls.
+#
+#   python -m benchmarks.standin_server --port 8800 --latency-ms 50 --rate-429 0.02
+import argparse
+import collections
+import glob
+import hashlib
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks import COMPANY_PAGES_DIR, DIRECTORY_PAGES_DIR
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency_ms=0.0, rate_404=0.0, rate_redirect=0.0,
+                 rate_429=0.0, retry_after=1, seed=0):
+        super().__init__(address, StandinHandler)
+        self.latency = latency_ms / 1000
+        self.rate_404 = rate_404
+        self.rate_redirect = rate_redirect
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.seed = seed
+        self.revision = 0
+        self.change_rate = 0.0
+        self.company_pages = [open(path, 'rb').read() for path in sorted(glob.glob(os.path.join(COMPANY_PAGES_DIR, '*.html')))]
+        self.directory_pages = [open(path, 'rb').read() for path in sorted(glob.glob(os.path.join(DIRECTORY_PAGES_DIR, '*.html')))]
+        self.lock = threading.Lock()
+        self.attempts = collections.Counter()
+        self.status_counts = collections.Counter()
+
+    @property
+    def base_url(self):
+        return 'http://%s:%d' % self.server_address[:2]
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def outcome(self, path):
+        with self.lock:
+            attempt = self.attempts[path]
+            self.attempts[path] += 1
+        rng = random.Random(f'{self.seed}:{path}:{attempt}')
+        draw = rng.random()
+        if draw < self.rate_429:
+            return 429
+        draw -= self.rate_429
+        if draw < self.rate_404:
+            return 404
+        draw -= self.rate_404
+        # redirect only the first attempt so redirects always terminate
+        if draw < self.rate_redirect and 'redirected=1' not in path:
+            return 302
+        return 200
+
+    def change_pages(self, rate):
+        """Starts a new revision in which a share `rate` of the company pages changed."""
+        with self.lock:
+            self.revision += 1
+            self.change_rate = rate
+
+    def page_revision(self, key):
+        if not self.revision:
+            return 0
+        changed = random.Random(f'{self.seed}:{key}:rev{self.revision}').random() < self.change_rate
+        return self.revision if changed else 0
+
+    def record(self, status):
+        with self.lock:
+            self.status_counts[status] += 1
+
+
+def _pick(pages, key):
+    return pages[int(hashlib.md5(key.encode('utf-8')).hexdigest(), 16) % len(pages)]
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b'', headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.record(status)
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        path, _, query = self.path.partition('?')
+        parts = [part for part in path.split('/') if part]
+        if len(parts) >= 2 and parts[0] == 'company':
+            pages = server.company_pages
+        elif len(parts) >= 2 and parts[0] == 'directory':
+            pages = server.directory_pages
+        else:
+            self._send(404, b'not found')
+            return
+
+        status = server.outcome(self.path)
+        if status == 429:
+            self._send(429, b'rate limited', [('Retry-After', str(server.retry_after))])
+        elif status == 404:
+            self._send(404, b'<html><body>Page not found</body></html>', [('Content-Type', 'text/html; charset=utf-8')])
+        elif status == 302:
+            location = path + '?' + (query + '&' if query else '') + 'redirected=1'
+            self._send(302, b'', [('Location', location)])
+        else:
+            # every directory section gets its own page, every company its own
+            key = '/'.join(parts[:3] if parts[0] == 'directory' else parts[:2])
+            body = _pick(pages, key)
+            revision = server.page_revision(key)
+            if revision:
+                body += b'<div class="revision">%d</div>' % revision
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            if self.headers.get('If-None-Match') == etag:
+                self._send(304, b'', [('ETag', etag)])
+            else:
+                self._send(200, body, [('Content-Type', 'text/html; charset=utf-8'), ('ETag', etag)])
+
+
+class RewriteToStandinMiddleware:
+    """Downloader middleware sending linkedin.com requests to the stand-in (STANDIN_URL setting)."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings.get('STANDIN_URL'))
+
+    def process_request(self, request, spider):
+        for prefix in ('https://www.linkedin.com', 'https://fr.linkedin.com', 'http://www.linkedin.com'):
+            if request.url.startswith(prefix):
+                return request.replace(url=self.base_url + request.url[len(prefix):])
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the fixture pages as a local linkedin.com stand-in')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--rate-404', type=float, default=0.0)
+    parser.add_argument('--rate-redirect', type=float, default=0.0)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    server = StandinServer(('127.0.0.1', args.port), args.latency_ms, args.rate_404,
+                           args.rate_redirect, args.rate_429, seed=args.seed)
+    print(f'Serving fixtures on {server.base_url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# archive.py
+#
+# Append-only archive of fetched pages, so extraction fixes can be re-run
+# offline (`scrapy reparse`) instead of re-downloading every company.
+#
+# Like a WARC.gz file, a segment (`pages-<timestamp>-<seq>.gz`) is a series
+# of independent gzip members, one per response. A member holds one JSON
+# header line (url, company_url, slug, status, headers, fetched_at) followed
+# by the body. `index.sqlite3` maps each record to (segment, offset, length),
+# so any page can be read back with one seek. The latest record per company
+# slug wins.
+import gzip
+import json
+import os
+import sqlite3
+import time
+
+from company_data_scraper.inputs import company_slug
+
+INDEX_FILE = 'index.sqlite3'
+SEGMENT_PREFIX = 'pages'
+
+
+class PageArchiveWriter:
+
+    def __init__(self, directory, max_segment_bytes=256 * 1024 * 1024, flush_interval=5.0):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.flush_interval = flush_interval
+        self.run_id = time.strftime('%Y%m%dT%H%M%S')
+        self.segment_seq = 0
+        self._segment = None
+        os.makedirs(directory, exist_ok=True)
+        self.index = _open_index(directory)
+
+    def _open_segment(self):
+        name = f'{SEGMENT_PREFIX}-{self.run_id}-{self.segment_seq:05d}.gz'
+        self.segment_seq += 1
+        self._segment = open(os.path.join(self.directory, name), 'xb')
+        self._segment_name = name
+        self._segment_bytes = 0
+        self._last_flush = time.monotonic()
+
+    def _close_segment(self):
+        if self._segment is not None:
+            self.flush()
+            self._segment.close()
+            self._segment = None
+
+    def write(self, url, status, headers, body, company_url=None):
+        slug = company_slug(company_url or url)
+        header = {
+            'url': url,
+            'company_url': company_url,
+            'slug': slug,
+            'status': status,
+            'headers': headers,
+            'fetched_at': time.time(),
+        }
+        member = gzip.compress(json.dumps(header).encode('utf-8') + b'\n' + body, compresslevel=6)
+        if self._segment is not None and self._segment_bytes >= self.max_segment_bytes:
+            self._close_segment()
+        if self._segment is None:
+            self._open_segment()
+        offset = self._segment_bytes
+        self._segment.write(member)
+        self._segment_bytes += len(member)
+        self.index.execute(
+            'INSERT INTO pages (slug, url, status, fetched_at, segment, offset, length) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (slug, url, status, header['fetched_at'], self._segment_name, offset, len(member)),
+        )
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        # index rows are only committed once the records they point to are on disk
+        if self._segment is not None:
+            self._segment.flush()
+            os.fsync(self._segment.fileno())
+            self._last_flush = time.monotonic()
+        self.index.commit()
+
+    def close(self):
+        self._close_segment()
+        self.index.commit()
+        self.index.close()
+
+
+def _open_index(directory):
+    index = sqlite3.connect(os.path.join(directory, INDEX_FILE))
+    index.execute('PRAGMA journal_mode=WAL')
+    index.execute(
+        'CREATE TABLE IF NOT EXISTS pages ('
+        'id INTEGER PRIMARY KEY, slug TEXT, url TEXT, status INTEGER, fetched_at REAL,'
+        'segment TEXT, offset INTEGER, length INTEGER)'
+    )
+    index.execute('CREATE INDEX IF NOT EXISTS pages_slug ON pages (slug, id)')
+    index.commit()
+    return index
+
+
+def read_record(directory, segment, offset, length):
+    """Returns `(header, body)` of the record stored at `offset` in `segment`."""
+    with open(os.path.join(directory, segment), 'rb') as f:
+        f.seek(offset)
+        data = gzip.decompress(f.read(length))
+    header, _, body = data.partition(b'\n')
+    return json.loads(header), body
+
+
+def iter_latest_locations(directory, status=200):
+    """(segment, offset, length) of the newest record with `status` per slug, in file order."""
+    index = _open_index(directory)
+    try:
+        rows = index.execute(
+            'SELECT segment, offset, length FROM pages WHERE id IN '
+            '(SELECT MAX(id) FROM pages WHERE ? IS NULL OR status = ? GROUP BY slug) '
+            'ORDER BY segment, offset',
+            (status, status),
+        )
+        yield from rows
+    finally:
+        index.close()
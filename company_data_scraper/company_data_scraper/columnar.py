@@ -0,0 +1,206 @@
+# columnar.py
+#
+# Parquet export of the company profiles, for analytics jobs that only need
+# a few columns or a few industries. Needs the optional `pyarrow` package.
+#
+# Columns follow CompanyProfileItem plus a `crawl_date`. The categorical
+# columns are dictionary-encoded, rows are buffered per partition and written
+# as row groups of PARQUET_ROW_GROUP_SIZE rows (with min/max statistics, so
+# readers can skip groups). With `partition_by` the files are laid out
+# Hive-style, e.g. `industry=Software%20Development/part-<run id>-00000.parquet`,
+# which `pyarrow.dataset` / pandas / Spark read back as a column.
+#
+# `convert_to_parquet` builds the whole dataset in a temporary directory next
+# to the destination and swaps it in at the end, so running it again replaces
+# the previous export instead of adding a second copy of every row. The crawl
+# pipeline appends one set of files per run to its own directory.
+import collections
+import datetime
+import os
+import shutil
+import time
+import urllib.parse
+import uuid
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency, only needed for Parquet exports
+    pa = pq = None
+
+from company_data_scraper.items import CATEGORICAL_FIELDS, FIELD_NAMES, CompanyProfileItem
+from company_data_scraper.storage import iter_latest_records, iter_legacy_records, iter_shard_records, list_shards
+
+PARTITION_COLUMNS = ('industry', 'crawl_date')
+INT_COLUMNS = ('linkedin_followers_count', 'num_of_employees', 'founded')
+HIVE_NULL = '__HIVE_DEFAULT_PARTITION__'
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ValueError("Parquet export requires the 'pyarrow' package (pip install pyarrow)")
+
+
+def profile_schema():
+    """The Arrow schema of the profile table."""
+    _require_pyarrow()
+    fields = []
+    for name in FIELD_NAMES:
+        if name in CATEGORICAL_FIELDS:
+            column_type = pa.dictionary(pa.int32(), pa.string())
+        elif name == 'founded':
+            column_type = pa.int16()
+        elif name in INT_COLUMNS:
+            column_type = pa.int64()
+        else:
+            column_type = pa.string()
+        fields.append(pa.field(name, column_type))
+    fields.append(pa.field('crawl_date', pa.date32()))
+    return pa.schema(fields)
+
+
+class ParquetProfileWriter:
+
+    def __init__(self, directory, partition_by=None, row_group_size=50_000, compression='zstd',
+                 max_buffered_rows=200_000, max_open_files=128):
+        _require_pyarrow()
+        if partition_by not in (None,) + PARTITION_COLUMNS:
+            raise ValueError(f"Unsupported partition column: {partition_by!r} (use None, 'industry' or 'crawl_date')")
+        self.directory = directory
+        self.partition_by = partition_by
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.max_buffered_rows = max(max_buffered_rows, row_group_size)
+        self.max_open_files = max_open_files
+        schema = profile_schema()
+        # the partition column lives in the directory name, not in the files
+        self.schema = schema.remove(schema.get_field_index(partition_by)) if partition_by else schema
+        # unique per writer, so two runs started in the same second don't overwrite each other's files
+        self.run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.rows_written = 0
+        self._buffers = {}                            # partition value -> {column: [values]}
+        self._buffered = 0
+        self._writers = collections.OrderedDict()     # partition value -> open ParquetWriter, LRU first
+        self._file_seq = collections.Counter()
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, item, crawl_date=None):
+        """Buffers one item (a CompanyProfileItem or a profile dict) for the next row group."""
+        if not isinstance(item, CompanyProfileItem):
+            item = CompanyProfileItem.from_profile(item)
+        record = item.to_dict()
+        for column in INT_COLUMNS:
+            if not isinstance(record[column], int):
+                record[column] = None
+        record['crawl_date'] = crawl_date or datetime.date.today()
+        key = record[self.partition_by] if self.partition_by else None
+
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = {name: [] for name in self.schema.names}
+        for name, values in buffer.items():
+            values.append(record[name])
+        self._buffered += 1
+        if len(buffer['company_url']) >= self.row_group_size:
+            self._flush_partition(key)
+        elif self._buffered >= self.max_buffered_rows:
+            # many small partitions: write out the biggest one early
+            self._flush_partition(max(self._buffers, key=lambda k: len(self._buffers[k]['company_url'])))
+
+    def _flush_partition(self, key):
+        buffer = self._buffers.pop(key)
+        rows = len(buffer['company_url'])
+        table = pa.Table.from_pydict(buffer, schema=self.schema)
+        self._writer(key).write_table(table, row_group_size=self.row_group_size)
+        self._buffered -= rows
+        self.rows_written += rows
+
+    def _writer(self, key):
+        writer = self._writers.get(key)
+        if writer is not None:
+            self._writers.move_to_end(key)
+            return writer
+        if len(self._writers) >= self.max_open_files:
+            _key, oldest = self._writers.popitem(last=False)
+            oldest.close()
+        directory = self.directory
+        if self.partition_by:
+            directory = os.path.join(directory, f'{self.partition_by}={_partition_value(key)}')
+            os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'part-{self.run_id}-{self._file_seq[key]:05d}.parquet')
+        self._file_seq[key] += 1
+        writer = self._writers[key] = pq.ParquetWriter(
+            path, self.schema, compression=self.compression,
+            use_dictionary=[name for name in CATEGORICAL_FIELDS if name in self.schema.names],
+        )
+        return writer
+
+    def close(self):
+        for key in list(self._buffers):
+            self._flush_partition(key)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+def _partition_value(value):
+    if value is None:
+        return HIVE_NULL
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return urllib.parse.quote(value, safe=' ,')
+
+
+def _run_date(shard_path):
+    # shards are named `<prefix>-<YYYYmmddTHHMMSS>-<seq>.jsonl[...]` after the run that wrote them
+    try:
+        return datetime.datetime.strptime(os.path.basename(shard_path).split('-')[1], '%Y%m%dT%H%M%S').date()
+    except (IndexError, ValueError):
+        return datetime.date.fromtimestamp(os.path.getmtime(shard_path))
+
+
+def iter_dated_records(output_file, output_dir):
+    """All profile records with the date they were crawled, as `crawl_date`.
+
+    Shards are dated by the run that wrote them, the legacy JSON file by its
+    modification time.
+    """
+    if os.path.exists(output_file):
+        crawl_date = datetime.date.fromtimestamp(os.path.getmtime(output_file))
+        for record in iter_legacy_records(output_file):
+            yield dict(record, crawl_date=crawl_date)
+    for path in list_shards(output_dir):
+        crawl_date = _run_date(path)
+        for record in iter_shard_records(path):
+            yield dict(record, crawl_date=crawl_date)
+
+
+def convert_to_parquet(output_file, output_dir, destination, partition_by=None, row_group_size=50_000,
+                       compression='zstd'):
+    """Writes the JSON/JSONL profile output (deduplicated by company_url) as Parquet under `destination`.
+
+    The dataset replaces whatever `destination` held, and only once it is
+    complete. Returns the number of rows written.
+    """
+    destination = os.path.normpath(destination)
+    suffix = uuid.uuid4().hex[:8]
+    staging = f'{destination}.tmp-{suffix}'
+    try:
+        writer = ParquetProfileWriter(staging, partition_by=partition_by, row_group_size=row_group_size,
+                                      compression=compression)
+        try:
+            for record in iter_latest_records(lambda: iter_dated_records(output_file, output_dir)):
+                writer.write(record, record['crawl_date'])
+        finally:
+            writer.close()
+        previous = None
+        if os.path.exists(destination):
+            previous = f'{destination}.old-{suffix}'
+            os.rename(destination, previous)
+        os.rename(staging, destination)
+    finally:
+        if os.path.exists(staging):
+            shutil.rmtree(staging)
+    if previous is not None:
+        shutil.rmtree(previous)
+    return writer.rows_written
@@ -0,0 +1,25 @@
+from scrapy.commands import ScrapyCommand
+
+from company_data_scraper.storage import convert_to_json_array
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {'LOG_ENABLED': False}
+
+    def syntax(self):
+        return '[options]'
+
+    def short_desc(self):
+        return 'Convert the JSONL profile shards into a single JSON array file'
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument('-o', '--output', dest='output', default=None,
+                            help='destination file (default: PROFILE_OUTPUT_FILE)')
+
+    def run(self, args, opts):
+        output_file = self.settings.get('PROFILE_OUTPUT_FILE', 'company_profile_data.json')
+        output_dir = self.settings.get('PROFILE_OUTPUT_DIR', 'company_profile_data')
+        count = convert_to_json_array(output_file, output_dir, destination=opts.output)
+        print(f" >  Wrote {count} company profiles to {opts.output or output_file}")
@@ -0,0 +1,39 @@
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+
+from company_data_scraper.columnar import PARTITION_COLUMNS, convert_to_parquet
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {'LOG_ENABLED': False}
+
+    def syntax(self):
+        return '[options]'
+
+    def short_desc(self):
+        return 'Convert the JSON/JSONL profile output into a Parquet dataset (needs pyarrow)'
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument('-o', '--output', dest='output', default=None,
+                            help='destination directory (default: PARQUET_OUTPUT_DIR)')
+        parser.add_argument('--partition-by', dest='partition_by', default=None, choices=PARTITION_COLUMNS,
+                            help='write one directory per industry or crawl date (default: PARQUET_PARTITION_BY)')
+        parser.add_argument('--row-group-size', dest='row_group_size', type=int, default=None,
+                            help='rows per row group (default: PARQUET_ROW_GROUP_SIZE)')
+
+    def run(self, args, opts):
+        destination = opts.output or self.settings.get('PARQUET_OUTPUT_DIR', 'company_profile_parquet')
+        try:
+            count = convert_to_parquet(
+                self.settings.get('PROFILE_OUTPUT_FILE', 'company_profile_data.json'),
+                self.settings.get('PROFILE_OUTPUT_DIR', 'company_profile_data'),
+                destination,
+                partition_by=opts.partition_by or self.settings.get('PARQUET_PARTITION_BY') or None,
+                row_group_size=opts.row_group_size or self.settings.getint('PARQUET_ROW_GROUP_SIZE', 50_000),
+                compression=self.settings.get('PARQUET_COMPRESSION', 'zstd'),
+            )
+        except ValueError as e:
+            raise UsageError(str(e), print_help=False)
+        print(f" >  Wrote {count} company profiles to {destination}")
@@ -0,0 +1,47 @@
+import glob
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+
+from company_data_scraper.inputs import InputCursor, merge_inputs
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {'LOG_ENABLED': False}
+
+    def syntax(self):
+        return '[options] [source ...]'
+
+    def short_desc(self):
+        return 'Merge the input files into one sorted file of unique company slugs'
+
+    def long_desc(self):
+        return ('Streams the company_ids CSVs and company_names JSON dicts given as arguments '
+                '(default: company_ids.csv and company_names_*.json), canonicalizes every entry to '
+                'its company slug and writes each company once, sorted, to a one-column CSV that '
+                'the profile spider reads with -a input_file=...')
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument('-o', '--output', dest='output', default='company_slugs.csv',
+                            help='merged input file (default: company_slugs.csv)')
+        parser.add_argument('--run-size', dest='run_size', type=int, default=100_000,
+                            help='slugs sorted in memory at a time (default: 100000)')
+
+    def run(self, args, opts):
+        sources = args or ['company_ids.csv'] + sorted(glob.glob('company_names_*.json'))
+        if opts.output in sources:
+            raise UsageError(f"The output file '{opts.output}' cannot also be a source")
+        if opts.run_size < 1:
+            raise UsageError('--run-size must be at least 1')
+        stats = merge_inputs(sources, opts.output, run_size=opts.run_size)
+        # a profile crawl resuming in the old file would skip rows of the new one
+        cursor = InputCursor(self.settings.get('INPUT_CURSOR_PATH', 'input_cursor.json'))
+        cursor.forget(opts.output)
+        cursor.save()
+        for path, counts in stats.items():
+            print(f" >  {path}: {counts['rows']} rows, {counts['unique']} new, "
+                  f"{counts['duplicates']} duplicates, {counts['skipped']} not company pages")
+        total = sum(counts['unique'] for counts in stats.values())
+        print(f" >  Wrote {total} unique companies to {opts.output}")
@@ -0,0 +1,29 @@
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+
+from company_data_scraper.storage import merge_outputs
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {'LOG_ENABLED': False}
+
+    def syntax(self):
+        return '[options] <output dir> [<output dir> ...]'
+
+    def short_desc(self):
+        return 'Merge the JSONL output of several workers, deduplicated by company_url'
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument('-o', '--output', dest='output', default=None,
+                            help='destination directory (default: PROFILE_OUTPUT_DIR)')
+
+    def run(self, args, opts):
+        if not args:
+            raise UsageError()
+        destination = opts.output or self.settings.get('PROFILE_OUTPUT_DIR', 'company_profile_data')
+        if destination in args:
+            raise UsageError('The destination must not be one of the merged directories')
+        count = merge_outputs(args, destination, compression=self.settings.get('PROFILE_OUTPUT_COMPRESSION') or None)
+        print(f" >  Merged {count} company profiles from {len(args)} directories into {destination}")
@@ -0,0 +1,98 @@
+import json
+import sys
+import time
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+
+from company_data_scraper.profile_index import NUMERIC_FIELDS, ProfileIndex
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {'LOG_ENABLED': False}
+
+    def syntax(self):
+        return 'update|query [options]'
+
+    def short_desc(self):
+        return 'Index the profile output and query it (filters, top-K) as JSON lines'
+
+    def long_desc(self):
+        return ('update: index the profile output (only files that changed since the last update).\n'
+                'query: update, then write the matching profiles to stdout (or -o) as JSON lines, e.g.\n'
+                '  scrapy profile_index query --industry "software development" --hq paris '
+                '--min-employees 500 --sort followers --top 10')
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument('--index', dest='index', default=None,
+                            help='index file (default: PROFILE_QUERY_INDEX_PATH)')
+        parser.add_argument('--no-update', dest='update', action='store_false',
+                            help='query: do not index new output first')
+        for option, field in (('--industry', 'industry'), ('--hq', 'headquarters'), ('--type', 'type'),
+                              ('--specialty', 'specialties')):
+            parser.add_argument(option, dest=field, action='append', default=None,
+                                help=f'query: every word must be in the {field} (repeatable)')
+        for column in NUMERIC_FIELDS:
+            parser.add_argument(f'--min-{column}', dest=f'min_{column}', type=int, default=None,
+                                help=f'query: at least this many {column}' if column != 'founded'
+                                else 'query: founded in or after this year')
+            parser.add_argument(f'--max-{column}', dest=f'max_{column}', type=int, default=None,
+                                help=f'query: at most this many {column}' if column != 'founded'
+                                else 'query: founded in or before this year')
+        parser.add_argument('--sort', dest='sort', default=None, choices=list(NUMERIC_FIELDS),
+                            help='query: order by this field, highest first (profiles without it are left out)')
+        parser.add_argument('--asc', dest='descending', action='store_false',
+                            help='query: with --sort, lowest first')
+        parser.add_argument('--top', dest='top', type=int, default=None,
+                            help='query: only the first N matches')
+        parser.add_argument('--count', dest='count', action='store_true',
+                            help='query: only print the number of matches')
+        parser.add_argument('-o', '--output', dest='output', default=None,
+                            help='query: write the JSON lines to this file instead of stdout')
+
+    def run(self, args, opts):
+        if len(args) != 1 or args[0] not in ('update', 'query'):
+            raise UsageError()
+        index = ProfileIndex(opts.index or self.settings.get('PROFILE_QUERY_INDEX_PATH', 'profile_index.sqlite3'))
+        try:
+            if args[0] == 'update' or opts.update:
+                start = time.perf_counter()
+                read = index.update(self.settings.get('PROFILE_OUTPUT_FILE', 'company_profile_data.json'),
+                                    self.settings.get('PROFILE_OUTPUT_DIR', 'company_profile_data'))
+                if read or args[0] == 'update':
+                    # progress goes to stderr, so stdout stays valid JSON lines
+                    print(f" >  Indexed {read} records in {time.perf_counter() - start:.1f}s, "
+                          f"{len(index)} companies in {index.path}", file=sys.stderr)
+            if args[0] == 'query':
+                self.query(index, opts)
+        finally:
+            index.close()
+
+    def query(self, index, opts):
+        text = {field: getattr(opts, field) for field in ('industry', 'headquarters', 'type', 'specialties')
+                if getattr(opts, field)}
+        ranges = {column: (getattr(opts, f'min_{column}'), getattr(opts, f'max_{column}'))
+                  for column in NUMERIC_FIELDS
+                  if getattr(opts, f'min_{column}') is not None or getattr(opts, f'max_{column}') is not None}
+        start = time.perf_counter()
+        try:
+            if opts.count:
+                print(index.count(text, ranges))
+                matches = None
+            else:
+                out = open(opts.output, 'w', encoding='utf-8') if opts.output else sys.stdout
+                matches = 0
+                try:
+                    for record in index.query(text, ranges, sort=opts.sort, descending=opts.descending,
+                                              limit=opts.top):
+                        out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                        matches += 1
+                finally:
+                    if opts.output:
+                        out.close()
+        except ValueError as e:
+            raise UsageError(str(e), print_help=False)
+        if matches is not None:
+            print(f" >  {matches} matches in {(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
@@ -0,0 +1,87 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+
+from company_data_scraper.archive import iter_latest_locations, read_record
+from company_data_scraper.extraction import extract_company_profile
+from company_data_scraper.items import CompanyProfileItem
+from company_data_scraper.storage import JsonlShardWriter
+
+
+def reparse_chunk(directory, locations):
+    """Re-extracts the archived pages at `locations`; runs in the worker processes."""
+    items = []
+    for segment, offset, length in locations:
+        header, body = read_record(directory, segment, offset, length)
+        content_type = (header['headers'].get('Content-Type') or [None])[0]
+        item = extract_company_profile(body, header['company_url'] or header['url'], content_type=content_type)
+        if item is not None:
+            # the same typed record the crawl writes
+            items.append(CompanyProfileItem.from_profile(item).to_dict())
+    return items, len(locations)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {'LOG_ENABLED': False}
+
+    def syntax(self):
+        return '[options]'
+
+    def short_desc(self):
+        return 'Re-run profile extraction over the page archive, without downloading anything'
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument('-o', '--output', dest='output', default='company_profile_data_reparsed',
+                            help='directory for the JSONL shards (default: company_profile_data_reparsed)')
+        parser.add_argument('--workers', dest='workers', type=int, default=os.cpu_count() or 1,
+                            help='extraction processes, 0 parses in this process (default: one per CPU)')
+        parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=200,
+                            help='pages handed to a worker at a time (default: 200)')
+
+    def run(self, args, opts):
+        directory = self.settings.get('PAGE_ARCHIVE_DIR', 'page_archive')
+        if not os.path.isdir(directory):
+            raise UsageError(f"No page archive at '{directory}' (crawl with PAGE_ARCHIVE_ENABLED=True first)")
+
+        chunks = _chunks(iter_latest_locations(directory), opts.chunk_size)
+        writer = JsonlShardWriter(opts.output)
+        pages = items = 0
+        try:
+            for chunk_items, chunk_pages in self._reparse(directory, chunks, opts.workers):
+                for item in chunk_items:
+                    writer.write(item)
+                pages += chunk_pages
+                items += len(chunk_items)
+        finally:
+            writer.close()
+        print(f" >  Re-extracted {items} company profiles from {pages} archived pages into {opts.output}")
+
+    @staticmethod
+    def _reparse(directory, chunks, workers):
+        if workers <= 0:
+            for chunk in chunks:
+                yield reparse_chunk(directory, chunk)
+            return
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            # a couple of chunks per worker in flight; results come back in archive order
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append(executor.submit(reparse_chunk, directory, chunk))
+                if len(in_flight) >= 2 * workers:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
@@ -0,0 +1,41 @@
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+
+from company_data_scraper.workqueue import WorkQueue
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {'LOG_ENABLED': False}
+
+    def syntax(self):
+        return 'init|status [options]'
+
+    def short_desc(self):
+        return 'Build or inspect the shared work queue of a sharded profile crawl'
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument('--queue', dest='queue', default='work_queue.sqlite3',
+                            help='queue file shared by the workers (default: work_queue.sqlite3)')
+        parser.add_argument('--shards', dest='shards', type=int, default=1,
+                            help='init: number of shards to split the URLs into (default: 1)')
+        parser.add_argument('-i', '--input-file', dest='input_file', default='company_ids.csv',
+                            help='init: comma-separated input files (default: company_ids.csv)')
+
+    def run(self, args, opts):
+        if len(args) != 1 or args[0] not in ('init', 'status'):
+            raise UsageError()
+        queue = WorkQueue(opts.queue)
+        try:
+            if args[0] == 'init':
+                if opts.shards < 1:
+                    raise UsageError('--shards must be at least 1')
+                input_files = [path.strip() for path in opts.input_file.split(',') if path.strip()]
+                added = queue.populate(input_files, opts.shards)
+                print(f" >  Queued {added} new URLs in {opts.queue} ({opts.shards} shards)")
+            status = queue.status()
+            print(f" >  {status['queued']} queued, {status['leased']} leased, "
+                  f"{status['expired']} expired leases, {status['done']} done")
+        finally:
+            queue.close()
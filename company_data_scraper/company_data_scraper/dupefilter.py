@@ -0,0 +1,231 @@
+# dupefilter.py
+#
+# Request dupefilter backed by a scalable Bloom filter, in place of
+# RFPDupeFilter's set of hex fingerprints (100+ bytes per URL, rewritten as a
+# text file under JOBDIR and read back in full on resume).
+#
+# The filter is a chain of slices. Each slice is a bit array sized for its
+# capacity and error rate; when one is full the next one is twice as large
+# with half the error rate, so the overall false-positive rate stays under
+# DUPEFILTER_ERROR_RATE however many URLs are added (about 1.8 bytes per URL
+# at 0.1%). A false positive drops a request that was never made, so keep
+# the rate low. Slices are memory-mapped files under JOBDIR (or
+# DUPEFILTER_PATH), which makes a resume instant; without either the filter
+# lives in anonymous memory for the run only, like RFPDupeFilter.
+import glob
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+
+from scrapy.dupefilters import BaseDupeFilter
+from scrapy.utils.job import job_dir
+from scrapy.utils.request import referer_str
+
+MAGIC = b'CDSBLOOM'
+HEADER = struct.Struct('<8sQQQd')   # magic, bits, hashes, capacity, error rate
+COUNT = struct.Struct('<Q')         # members, right after the header
+DATA_OFFSET = 64
+
+logger = logging.getLogger(__name__)
+
+
+class BloomSlice:
+
+    def __init__(self, path, capacity=None, error_rate=None):
+        """Opens the slice at `path`, or creates it (in anonymous memory if `path` is None)."""
+        self.path = path
+        self.file = None
+        if path is not None and os.path.exists(path):
+            self.file = open(path, 'r+b')
+            self.map = mmap.mmap(self.file.fileno(), 0)
+            magic, self.bits, self.hashes, self.capacity, self.error_rate = HEADER.unpack_from(self.map)
+            if magic != MAGIC or len(self.map) != DATA_OFFSET + self.bits // 8:
+                raise ValueError(f"'{path}' is not a dupefilter slice")
+            return
+        bits = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.bits = (bits + 63) // 64 * 64
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.capacity = capacity
+        self.error_rate = error_rate
+        size = DATA_OFFSET + self.bits // 8
+        if path is None:
+            self.map = mmap.mmap(-1, size)
+        else:
+            self.file = open(path, 'w+b')
+            self.file.truncate(size)
+            self.map = mmap.mmap(self.file.fileno(), 0)
+        self.map[:HEADER.size] = HEADER.pack(MAGIC, self.bits, self.hashes, capacity, error_rate)
+
+    @property
+    def count(self):
+        return COUNT.unpack_from(self.map, HEADER.size)[0]
+
+    def _positions(self, h1, h2):
+        bits = self.bits
+        return [(h1 + i * h2) % bits for i in range(self.hashes)]
+
+    def __contains__(self, hashes):
+        data = self.map
+        for position in self._positions(*hashes):
+            if not data[DATA_OFFSET + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, hashes):
+        data = self.map
+        for position in self._positions(*hashes):
+            offset = DATA_OFFSET + (position >> 3)
+            data[offset] |= 1 << (position & 7)
+        COUNT.pack_into(data, HEADER.size, self.count + 1)
+
+    @property
+    def is_full(self):
+        return self.count >= self.capacity
+
+    def fill_ratio(self):
+        """Share of the bits that are set."""
+        ones = 0
+        view = memoryview(self.map)[DATA_OFFSET:]
+        for start in range(0, len(view), 1 << 20):
+            ones += int.from_bytes(view[start:start + (1 << 20)], 'little').bit_count()
+        view.release()
+        return ones / self.bits
+
+    def flush(self):
+        if self.file is not None:
+            self.map.flush()
+
+    def close(self):
+        self.flush()
+        self.map.close()
+        if self.file is not None:
+            self.file.close()
+
+
+class ScalableBloomFilter:
+    """Set of byte strings with no false negatives and a bounded false-positive rate."""
+
+    def __init__(self, directory=None, capacity=1_000_000, error_rate=0.001, growth=2, tightening=0.5):
+        self.directory = directory
+        self.initial_capacity = capacity
+        # the slice error rates add up to at most `error_rate`
+        self.initial_error_rate = error_rate * (1 - tightening)
+        self.growth = growth
+        self.tightening = tightening
+        self.slices = []
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            for path in sorted(glob.glob(os.path.join(directory, 'bloom-*.bin'))):
+                self.slices.append(BloomSlice(path))
+        if not self.slices:
+            self._add_slice()
+
+    def _add_slice(self):
+        n = len(self.slices)
+        path = os.path.join(self.directory, f'bloom-{n:05d}.bin') if self.directory is not None else None
+        capacity = self.initial_capacity * self.growth ** n
+        error_rate = self.initial_error_rate * self.tightening ** n
+        self.slices.append(BloomSlice(path, capacity, error_rate))
+
+    @staticmethod
+    def _hashes(value):
+        digest = hashlib.blake2b(value, digest_size=16).digest()
+        return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+    def __contains__(self, value):
+        hashes = self._hashes(value)
+        return any(hashes in bloom for bloom in self.slices)
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self.slices)
+
+    def add(self, value):
+        """Adds `value`; returns False if it was (probably) there already."""
+        hashes = self._hashes(value)
+        if any(hashes in bloom for bloom in self.slices):
+            return False
+        if self.slices[-1].is_full:
+            self._add_slice()
+        self.slices[-1].add(hashes)
+        return True
+
+    def occupancy(self):
+        """Members, size and the current false-positive estimate, e.g. for the crawl stats."""
+        miss = 1.0
+        for bloom in self.slices:
+            miss *= 1 - bloom.fill_ratio() ** bloom.hashes
+        members = len(self)
+        size = sum(bloom.bits // 8 for bloom in self.slices)
+        return {
+            'members': members,
+            'slices': len(self.slices),
+            'bytes': size,
+            'bytes_per_member': size / members if members else None,
+            'capacity': sum(bloom.capacity for bloom in self.slices),
+            'false_positive_rate': 1 - miss,
+        }
+
+    def flush(self):
+        for bloom in self.slices:
+            bloom.flush()
+
+    def close(self):
+        for bloom in self.slices:
+            bloom.close()
+
+
+class BloomDupeFilter(BaseDupeFilter):
+    """Request fingerprint dupefilter on a ScalableBloomFilter (DUPEFILTER_CAPACITY, DUPEFILTER_ERROR_RATE)."""
+
+    def __init__(self, path=None, capacity=1_000_000, error_rate=0.001, debug=False, fingerprinter=None,
+                 stats=None):
+        self.filter = ScalableBloomFilter(path, capacity=capacity, error_rate=error_rate)
+        self.fingerprinter = fingerprinter
+        self.debug = debug
+        self.logdupes = True
+        self.stats = stats
+        if path is not None and len(self.filter):
+            print(f" >  Dupefilter resumed with {len(self.filter)} request fingerprints from {path}")
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        path = settings.get('DUPEFILTER_PATH') or None
+        if path is None and job_dir(settings):
+            path = os.path.join(job_dir(settings), 'requests.bloom')
+        return cls(
+            path,
+            capacity=settings.getint('DUPEFILTER_CAPACITY', 1_000_000),
+            error_rate=settings.getfloat('DUPEFILTER_ERROR_RATE', 0.001),
+            debug=settings.getbool('DUPEFILTER_DEBUG'),
+            fingerprinter=crawler.request_fingerprinter,
+            stats=crawler.stats,
+        )
+
+    def request_seen(self, request):
+        return not self.filter.add(self.fingerprinter.fingerprint(request))
+
+    def close(self, reason):
+        occupancy = self.filter.occupancy()
+        if self.stats is not None:
+            for key, value in occupancy.items():
+                if value is not None:
+                    self.stats.set_value(f'dupefilter/bloom/{key}', value)
+        print(f" >  Dupefilter: {occupancy['members']} fingerprints in {occupancy['slices']} slice(s), "
+              f"{occupancy['bytes'] / 2**20:.1f} MB, estimated false-positive rate "
+              f"{occupancy['false_positive_rate']:.2e}")
+        self.filter.close()
+
+    def log(self, request, spider):
+        if self.debug:
+            logger.debug("Filtered duplicate request: %(request)s (referer: %(referer)s)",
+                         {'request': request, 'referer': referer_str(request)}, extra={'spider': spider})
+        elif self.logdupes:
+            logger.debug("Filtered duplicate request: %(request)s - no more duplicates will be shown"
+                         " (see DUPEFILTER_DEBUG to show all duplicates)",
+                         {'request': request}, extra={'spider': spider})
+            self.logdupes = False
+        spider.crawler.stats.inc_value('dupefilter/filtered', spider=spider)
@@ -0,0 +1,88 @@
+# extensions.py
+#
+# MetricsExporter writes a snapshot of the crawl metrics (see metrics.py)
+# every METRICS_EXPORT_INTERVAL seconds to a JSON lines file, and can serve
+# them live in the Prometheus text format on 127.0.0.1:METRICS_HTTP_PORT.
+import json
+import time
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task
+from twisted.web import resource, server
+
+from company_data_scraper.metrics import metrics_for
+
+
+class MetricsResource(resource.Resource):
+    isLeaf = True
+
+    def __init__(self, metrics):
+        super().__init__()
+        self.metrics = metrics
+
+    def render_GET(self, request):
+        # rendered on the reactor thread, so the metrics are never read mid-update
+        request.setHeader(b'Content-Type', b'text/plain; version=0.0.4; charset=utf-8')
+        return self.metrics.to_prometheus().encode('utf-8')
+
+
+class MetricsExporter:
+
+    def __init__(self, metrics, interval=30.0, jsonl_path=None, http_port=0):
+        self.metrics = metrics
+        self.interval = interval
+        self.jsonl_path = jsonl_path
+        self.http_port = http_port
+        self.file = None
+        self.listener = None
+        self.loop = None
+        self._last = (time.time(), 0)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('METRICS_ENABLED'):
+            raise NotConfigured
+        exporter = cls(
+            metrics_for(crawler),
+            interval=settings.getfloat('METRICS_EXPORT_INTERVAL', 30.0),
+            jsonl_path=settings.get('METRICS_JSONL_PATH') or None,
+            http_port=settings.getint('METRICS_HTTP_PORT', 0),
+        )
+        crawler.signals.connect(exporter.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(exporter.spider_closed, signal=signals.spider_closed)
+        return exporter
+
+    def spider_opened(self, spider):
+        if self.jsonl_path:
+            self.file = open(self.jsonl_path, 'a')
+        if self.http_port:
+            from twisted.internet import reactor
+            self.listener = reactor.listenTCP(self.http_port, server.Site(MetricsResource(self.metrics)),
+                                              interface='127.0.0.1')
+            print(f" >  Serving metrics on http://127.0.0.1:{self.http_port}/metrics")
+        if self.file is not None and self.interval > 0:
+            self.loop = task.LoopingCall(self.export)
+            self.loop.start(self.interval, now=False)
+
+    def export(self, final=False):
+        snapshot = self.metrics.snapshot()
+        # throughput over the last interval, next to the whole-run average
+        last_time, last_items = self._last
+        window = snapshot['time'] - last_time
+        snapshot['items_per_second_recent'] = (snapshot['items'] - last_items) / window if window > 0 else 0.0
+        snapshot['final'] = final
+        self._last = (snapshot['time'], snapshot['items'])
+        if self.file is not None:
+            self.file.write(json.dumps(snapshot) + '\n')
+            self.file.flush()
+
+    def spider_closed(self, spider):
+        if self.loop is not None and self.loop.running:
+            self.loop.stop()
+        self.export(final=True)
+        if self.file is not None:
+            self.file.close()
+        if self.listener is not None:
+            self.listener.stopListening()
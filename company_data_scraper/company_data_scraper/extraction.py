@@ -0,0 +1,207 @@
+# extraction.py
+#
+# Company profile extraction on raw HTML bytes.
+#
+# The CSS selectors the spider used to run through Scrapy selectors are
+# translated to XPath and compiled once at import time. A page is parsed
+# once, and the `.mb-2` detail blocks are read in a single loop into a
+# label -> value map, instead of re-querying each block per field. The
+# output is the same dict `CompanyProfileScraperSpider.parse_response`
+# produced, quirks included (see `_fill_details`).
+import codecs
+import hashlib
+import re
+import threading
+
+from lxml import etree, html
+from parsel.csstranslator import HTMLTranslator
+from w3lib.encoding import html_body_declared_encoding, http_content_type_encoding, read_bom
+
+_css = HTMLTranslator().css_to_xpath
+
+# One document-wide query finds every element the profile fields hang off;
+# the field selectors below then only run inside those (small) subtrees.
+ANCHORS = etree.XPath(
+    "descendant-or-self::*[contains(@class, 'top-card-layout__') or contains(@class, 'core-section-container__content')"
+    " or contains(@class, 'face-pile__text')]"
+)
+ENTITY_INFO = 'top-card-layout__entity-info'
+IMAGE_CONTAINER = 'top-card-layout__entity-image-container'
+FIRST_SUBLINE = 'top-card-layout__first-subline'
+SECTION_CONTENT = 'core-section-container__content'
+FACE_PILE_TEXT = 'face-pile__text'
+
+# Relative forms of the selectors the spider used, e.g. '.top-card-layout__entity-info h1::text'
+COMPANY_NAME = etree.XPath('descendant::h1/text()')
+FOLLOWERS = etree.XPath('span/following-sibling::text()')
+LOGO_URL = etree.XPath('descendant::img/@data-delayed-url')
+ABOUT_US = etree.XPath('descendant::p/text()')
+EMPLOYEES_TEXT = etree.XPath('text()')
+DETAILS = etree.XPath('descendant::*' + _css('.mb-2')[len('descendant-or-self::*'):])
+DETAIL_LINK_TEXT = etree.XPath(_css('a::text'))
+DETAIL_TEXTS = etree.XPath(_css('.text-md::text'))
+
+EMPLOYEES_RE = re.compile(r'\d{1,3}(?:,\d{3})*')
+
+# Parts of a page that change on every request without the profile changing
+VOLATILE_RE = re.compile(rb'<(script|style|noscript)\b.*?</\1\s*>|<!--.*?-->', re.DOTALL | re.IGNORECASE)
+WHITESPACE_RE = re.compile(rb'\s+')
+
+# detail label -> item field, and how the value is cleaned up
+DETAIL_FIELDS = {
+    'industry': ('industry', str.strip),
+    'company size': ('company_size_approx', lambda value: value.strip().split()[0]),
+    'headquarters': ('headquarters', str.strip),
+    'type': ('type', str.strip),
+    'founded': ('founded', str.strip),
+}
+
+# lxml parsers must not be shared between threads (see extraction_pool.py)
+_local = threading.local()
+
+
+def _first(results, default='not-found'):
+    return str(results[0]) if results else default
+
+
+def _first_in(anchors, xpath, default='not-found'):
+    # anchors come in document order, so the first hit is the document-wide first
+    for anchor in anchors:
+        results = xpath(anchor)
+        if results:
+            return str(results[0])
+    return default
+
+
+def _classify_anchors(elements):
+    """Groups the ANCHORS hits by the role they play, matching CSS class semantics."""
+    anchors = {ENTITY_INFO: [], IMAGE_CONTAINER: [], FIRST_SUBLINE: [], SECTION_CONTENT: [], FACE_PILE_TEXT: []}
+    for element in elements:
+        class_attr = element.get('class')
+        # CSS classes are split on the same whitespace as XPath's normalize-space()
+        classes = set(class_attr.replace('\t', ' ').replace('\n', ' ').replace('\r', ' ').split(' '))
+        tag = element.tag
+        if ENTITY_INFO in classes:
+            anchors[ENTITY_INFO].append(element)
+        if IMAGE_CONTAINER in classes and tag == 'div':
+            anchors[IMAGE_CONTAINER].append(element)
+        if FIRST_SUBLINE in class_attr and tag == 'h3':
+            # matched with contains(@class, ...) like the original XPath
+            anchors[FIRST_SUBLINE].append(element)
+        if SECTION_CONTENT in classes:
+            anchors[SECTION_CONTENT].append(element)
+        if FACE_PILE_TEXT in classes and tag == 'p':
+            anchors[FACE_PILE_TEXT].append(element)
+    return anchors
+
+
+def detect_encoding(body, content_type=None):
+    """Same precedence as Scrapy's TextResponse: header, BOM, <meta>, then utf-8."""
+    encoding = http_content_type_encoding(content_type) if content_type else None
+    if not encoding:
+        encoding = read_bom(body)[0]
+    return encoding or html_body_declared_encoding(body) or 'utf-8'
+
+
+def content_hash(body):
+    """Hash of a page without scripts, styles, comments and whitespace runs, to spot real changes."""
+    body = WHITESPACE_RE.sub(b' ', VOLATILE_RE.sub(b'', body))
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def parse_html(body, encoding=None, content_type=None):
+    """Parses raw page bytes into an lxml root element, like Scrapy selectors do."""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+        encoding = 'utf-8'
+    encoding = encoding or detect_encoding(body, content_type)
+    if codecs.lookup(encoding).name != 'utf-8':
+        body = body.decode(encoding, errors='replace').encode('utf-8')
+    body = body.replace(b'\x00', b'').strip() or b'<html/>'
+    parser = getattr(_local, 'parser', None)
+    if parser is None:
+        parser = _local.parser = html.HTMLParser(recover=True, encoding='utf-8', huge_tree=True)
+    root = etree.fromstring(body, parser=parser)
+    if root is None:
+        root = etree.fromstring(b'<html/>', parser=parser)
+    return root
+
+
+def _fill_details(company_item, details):
+    """Reads the `.mb-2` blocks ([label, value, ...] text lists) into `company_item`."""
+    try:
+        company_item['website'] = _first(DETAIL_LINK_TEXT(details[0][0])).strip()
+    except IndexError:
+        company_item['website'] = ""
+
+    company_item['industry'] = ""
+    company_item['company_size_approx'] = ""
+    company_item['headquarters'] = ""
+    company_item['type'] = ""
+    company_item['founded'] = ""
+
+    for _element, texts in details:
+        field = DETAIL_FIELDS.get(texts[0].lower().strip()) if texts else None
+        if field is not None and len(texts) > 1:
+            try:
+                company_item[field[0]] = field[1](texts[1])
+            except IndexError:
+                pass
+
+    # The sixth block is either "founded" (then maybe "specialties" next) or
+    # "specialties"; anything else marks both as not found. Its label is also
+    # stored as a key of its own, and a missing block resets both fields.
+    try:
+        unsure_parameter = details[5][1]
+        unsure_parameter_key = unsure_parameter[0].lower().strip()
+        company_item[unsure_parameter_key] = unsure_parameter[1].strip()
+        if unsure_parameter_key == 'founded':
+            company_specialties = details[6][1]
+            if company_specialties[0].lower().strip() == 'specialties':
+                company_item['specialties'] = company_specialties[1].strip()
+            else:
+                company_item['specialties'] = 'not-found'
+        elif unsure_parameter_key != 'specialties':
+            company_item['founded'] = 'not-found'
+            company_item['specialties'] = 'not-found'
+    except IndexError:
+        company_item['founded'] = ""
+        company_item['specialties'] = ""
+
+
+def extract_company_profile(body, company_url, encoding=None, content_type=None):
+    """Extracts a company profile dict from the raw HTML of a LinkedIn company page.
+
+    Returns None when the page has no company name (profile did not render).
+    """
+    root = parse_html(body, encoding, content_type)
+    anchors = _classify_anchors(ANCHORS(root))
+
+    company_item = {}
+    company_item['company_url'] = company_url
+    company_item['company_name'] = _first_in(anchors[ENTITY_INFO], COMPANY_NAME).strip()
+    if company_item['company_name'] == 'not-found':
+        return None
+
+    followers_count_text = _first_in(anchors[FIRST_SUBLINE], FOLLOWERS)
+    try:
+        company_item['linkedin_followers_count'] = int(followers_count_text.split()[0].strip().replace(',', '')) if followers_count_text != 'not-found' else None
+    except (ValueError, IndexError):
+        company_item['linkedin_followers_count'] = None
+
+    company_item['company_logo_url'] = _first_in(anchors[IMAGE_CONTAINER], LOGO_URL)
+    company_item['about_us'] = _first_in(anchors[SECTION_CONTENT], ABOUT_US).strip()
+
+    employees_match = EMPLOYEES_RE.search(_first_in(anchors[FACE_PILE_TEXT], EMPLOYEES_TEXT).strip())
+    company_item['num_of_employees'] = int(employees_match.group().replace(',', '')) if employees_match else None
+
+    seen = set()
+    details = []
+    for content in anchors[SECTION_CONTENT]:
+        for element in DETAILS(content):
+            # nested content blocks would return the same detail twice
+            if element not in seen:
+                seen.add(element)
+                details.append((element, [str(text) for text in DETAIL_TEXTS(element)]))
+    _fill_details(company_item, details)
+    return company_item
@@ -0,0 +1,60 @@
+# extraction_pool.py
+#
+# Runs extract_company_profile away from the Twisted reactor thread.
+#
+# Response bodies go to a pool of worker processes (or threads: lxml releases
+# the GIL while it parses) and the spider awaits the resulting future, so
+# downloads and other callbacks keep going while a page is parsed. A
+# semaphore bounds the pages queued in the pool; callbacks waiting on it keep
+# their responses in Scrapy's scraper slot, and once SCRAPER_SLOT_MAX_ACTIVE_SIZE
+# is reached the engine stops feeding the downloader.
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from company_data_scraper.extraction import extract_company_profile
+
+
+class ExtractionPool:
+
+    def __init__(self, workers, executor='process', max_in_flight=0):
+        if executor not in ('process', 'thread'):
+            raise ValueError(f"EXTRACTION_EXECUTOR must be 'process' or 'thread', got {executor!r}")
+        self.workers = workers
+        self.executor_kind = executor
+        self.max_in_flight = max_in_flight or 2 * workers
+        self._executor = None
+        self._semaphore = None
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Returns a pool, or None when EXTRACTION_WORKERS is 0 (parse inline)."""
+        workers = settings.getint('EXTRACTION_WORKERS', 0)
+        if workers < 0:
+            workers = os.cpu_count() or 1
+        if not workers:
+            return None
+        return cls(workers, settings.get('EXTRACTION_EXECUTOR', 'process'),
+                   settings.getint('EXTRACTION_MAX_IN_FLIGHT', 0))
+
+    def _start(self):
+        if self.executor_kind == 'process':
+            # never fork a process that is running the reactor
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        else:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='extraction')
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+    async def extract(self, body, company_url, encoding=None, content_type=None):
+        """Awaitable version of extract_company_profile, run in the pool."""
+        if self._executor is None:
+            self._start()
+        async with self._semaphore:
+            future = self._executor.submit(extract_company_profile, body, company_url, encoding, content_type)
+            return await asyncio.wrap_future(future)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
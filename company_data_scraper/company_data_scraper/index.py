@@ -0,0 +1,199 @@
+# index.py
+#
+# Persistent index of the company URLs already written to the profile output.
+#
+# The pipeline adds URLs as it writes items and commits them only once the
+# items themselves are on disk, so the index never claims a company that a
+# crash lost. The spider checks membership against it at startup instead of
+# parsing the whole output dataset.
+#
+# It also keeps the page state used by refresh crawls (`-a refresh=1`): the
+# ETag / Last-Modified validators and content hash of the last fetch, and
+# when the page is next due. The refresh interval halves when a page changed
+# and grows by half when it did not, so the due queue is ordered by
+# staleness relative to how often each company actually changes.
+#
+# URLs are stored in the canonical form the input readers yield (see
+# inputs.canonical_url), whatever form they are passed in, so a company
+# scraped under `fr.linkedin.com/company/Foo/` is known as the one in
+# `company_ids.csv`. Indexes written before that are migrated when opened.
+import sqlite3
+import time
+
+from company_data_scraper.inputs import canonical_url
+from company_data_scraper.storage import iter_output_records
+
+
+DAY = 24 * 3600
+
+
+class ScrapedUrlIndex:
+
+    def __init__(self, path, refresh_intervals=(7 * DAY, DAY, 60 * DAY)):
+        self.path = path
+        # (initial, minimum, maximum) seconds between two fetches of a page
+        self.refresh_intervals = refresh_intervals
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS scraped_urls (url TEXT PRIMARY KEY) WITHOUT ROWID')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS page_state (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT,'
+            ' content_hash TEXT, fetched_at REAL, changed_at REAL, interval REAL, next_due REAL,'
+            ' checks INTEGER, changes INTEGER) WITHOUT ROWID'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS page_state_due ON page_state (next_due)')
+        self.conn.commit()
+        # state of changed pages whose items are not written yet: url -> record_page() kwargs
+        self._staged = {}
+        # called after every commit(), e.g. for the spider to advance its cursor past what is durable
+        self.commit_listeners = []
+        if self.get_meta('url_form') != 'canonical':
+            self._canonicalize()
+
+    def _canonicalize(self):
+        # rows keyed by the raw URL of an older run move to the canonical URL; when both
+        # exist, the page state of the latest fetch is kept
+        moved = 0
+        for (url,) in self.conn.execute('SELECT url FROM scraped_urls').fetchall():
+            key = canonical_url(url)
+            if key != url:
+                self.conn.execute('INSERT OR IGNORE INTO scraped_urls (url) VALUES (?)', (key,))
+                self.conn.execute('DELETE FROM scraped_urls WHERE url = ?', (url,))
+                moved += 1
+        for url, fetched_at in self.conn.execute('SELECT url, fetched_at FROM page_state').fetchall():
+            key = canonical_url(url)
+            if key == url:
+                continue
+            row = self.conn.execute('SELECT fetched_at FROM page_state WHERE url = ?', (key,)).fetchone()
+            if row is None or (row[0] or 0) < (fetched_at or 0):
+                self.conn.execute('DELETE FROM page_state WHERE url = ?', (key,))
+                self.conn.execute('UPDATE page_state SET url = ? WHERE url = ?', (key, url))
+            else:
+                self.conn.execute('DELETE FROM page_state WHERE url = ?', (url,))
+        self.set_meta('url_form', 'canonical')
+        self.conn.commit()
+        if moved:
+            print(f" >  Moved {moved} scraped company URLs to their canonical form")
+
+    def __contains__(self, url):
+        return self.conn.execute('SELECT 1 FROM scraped_urls WHERE url = ?',
+                                 (canonical_url(url),)).fetchone() is not None
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM scraped_urls').fetchone()[0]
+
+    def add(self, url):
+        """Adds `url` (and its staged page state); it only becomes durable at the next `commit()`."""
+        url = canonical_url(url)
+        self.conn.execute('INSERT OR IGNORE INTO scraped_urls (url) VALUES (?)', (url,))
+        state = self._staged.pop(url, None)
+        if state is not None:
+            self.record_page(url, **state)
+
+    def stage_page(self, url, etag=None, last_modified=None, content_hash=None, fetched_at=None):
+        """Keeps the state of a changed page until `add()` is called once its item is written."""
+        self._staged[canonical_url(url)] = {'etag': etag, 'last_modified': last_modified, 'content_hash': content_hash,
+                             'changed': True, 'fetched_at': fetched_at or time.time()}
+
+    def is_staged(self, url):
+        """True if `url` was fetched with new content whose item still has to be written."""
+        return canonical_url(url) in self._staged
+
+    def record_page(self, url, etag=None, last_modified=None, content_hash=None, changed=False, fetched_at=None):
+        """Stores the result of fetching `url` and schedules its next refresh."""
+        url = canonical_url(url)
+        initial, minimum, maximum = self.refresh_intervals
+        fetched_at = fetched_at or time.time()
+        row = self.conn.execute(
+            'SELECT content_hash, changed_at, interval, checks, changes FROM page_state WHERE url = ?', (url,)
+        ).fetchone()
+        if row is None:
+            changed_at, interval, checks, changes = fetched_at, initial, 0, 0
+        else:
+            old_hash, changed_at, interval, checks, changes = row
+            content_hash = content_hash or old_hash  # a 304 carries no body to hash
+            if changed:
+                changed_at, changes = fetched_at, changes + 1
+                interval = max(minimum, interval / 2)
+            else:
+                interval = min(maximum, interval * 1.5)
+        self.conn.execute(
+            'INSERT OR REPLACE INTO page_state (url, etag, last_modified, content_hash, fetched_at, changed_at,'
+            ' interval, next_due, checks, changes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (url, etag, last_modified, content_hash, fetched_at, changed_at, interval,
+             fetched_at + interval, checks + 1, changes),
+        )
+
+    def iter_due(self, now=None, limit=0):
+        """Yields `(url, state)` for scraped pages due for a refresh, most overdue first.
+
+        Pages scraped before page state was kept come first, with `state` None.
+        Reads from a snapshot, so the rows can be updated while iterating.
+        """
+        now = now or time.time()
+        conn = sqlite3.connect(self.path)
+        try:
+            rows = conn.execute(
+                'SELECT s.url, p.etag, p.last_modified, p.content_hash, p.interval FROM scraped_urls s'
+                ' LEFT JOIN page_state p ON p.url = s.url WHERE p.next_due IS NULL OR p.next_due <= ?'
+                ' ORDER BY COALESCE(p.next_due, 0) LIMIT ?',
+                (now, limit or -1),
+            )
+            for url, etag, last_modified, content_hash, interval in rows:
+                state = None
+                if interval is not None:
+                    state = {'etag': etag, 'last_modified': last_modified,
+                             'content_hash': content_hash, 'interval': interval}
+                yield url, state
+        finally:
+            conn.close()
+
+    def commit(self):
+        self.conn.commit()
+        for listener in self.commit_listeners:
+            listener()
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def bootstrap(self, output_file, output_dir):
+        """One-time import of the URLs of an output written before the index existed."""
+        if self.get_meta('bootstrapped'):
+            return 0
+        count = 0
+        for item in iter_output_records(output_file, output_dir):
+            if item.get('company_url'):
+                self.add(item['company_url'])
+                count += 1
+        self.set_meta('bootstrapped', '1')
+        self.commit()
+        return count
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def open_scraped_index(settings):
+    """Opens the index configured by SCRAPED_INDEX_PATH, importing old output on first use."""
+    index = ScrapedUrlIndex(
+        settings.get('SCRAPED_INDEX_PATH', 'scraped_index.sqlite3'),
+        refresh_intervals=(
+            settings.getfloat('REFRESH_INITIAL_DAYS', 7) * DAY,
+            settings.getfloat('REFRESH_MIN_DAYS', 1) * DAY,
+            settings.getfloat('REFRESH_MAX_DAYS', 60) * DAY,
+        ),
+    )
+    imported = index.bootstrap(
+        settings.get('PROFILE_OUTPUT_FILE', 'company_profile_data.json'),
+        settings.get('PROFILE_OUTPUT_DIR', 'company_profile_data'),
+    )
+    if imported:
+        print(f" >  Indexed {imported} already scraped company URLs")
+    return index
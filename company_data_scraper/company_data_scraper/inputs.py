@@ -0,0 +1,373 @@
+# inputs.py
+#
+# Streaming readers for the spider inputs (`company_ids.csv` and the
+# `company_names_*.json` dicts) plus a persisted cursor to resume them.
+#
+# Every reader yields `(url, start, end)` where `start`/`end` are the byte
+# offsets of the row in the input file, so a later run can seek straight to
+# `start` of the first row it has not finished instead of rescanning the file.
+#
+# The same company shows up under several URL forms across the sources
+# (`fr.`/`www.` hosts, trailing slashes, `trk` params, escaped or plain
+# accents), so readers canonicalize every entry to its company slug.
+# `merge_inputs` streams all sources into one sorted file of unique slugs.
+import array
+import codecs
+import csv
+import hashlib
+import heapq
+import json
+import os
+import tempfile
+from urllib.parse import quote, unquote, urlsplit
+
+PROFILE_URL_TEMPLATE = "https://www.linkedin.com/company/{}/?trk=companies_directory"
+_WHITESPACE = ' \t\r\n'
+
+
+def company_slug(url):
+    """The `<slug>` of a `.../company/<slug>/...` URL, or the URL itself for other pages."""
+    parts = [part for part in urlsplit(url).path.split('/') if part]
+    if len(parts) >= 2 and parts[0] == 'company':
+        return parts[1]
+    return url
+
+
+def canonical_slug(value):
+    """Canonical slug of a company URL or bare slug, or None if `value` is not a company page.
+
+    The host (and its locale), query string, fragment and trailing slash are
+    ignored. The slug is lowercased and percent-escaped the same way whatever
+    form it came in, e.g. `https://fr.linkedin.com/company/Capital-Sant%C3%A9/`
+    and `capital-santé` are both `capital-sant%C3%A9`.
+    """
+    value = value.strip()
+    if value.startswith(('linkedin.com/', 'www.linkedin.com/')):
+        value = 'https://' + value
+    if '://' in value or value.startswith('/'):
+        parts = urlsplit(value)
+        if parts.netloc and not parts.netloc.lower().endswith('linkedin.com'):
+            return None
+        segments = [segment for segment in parts.path.split('/') if segment]
+        if len(segments) < 2 or segments[0] != 'company':
+            return None
+        value = segments[1]
+    else:
+        value = value.strip('/')
+    if not value or '/' in value:
+        return None
+    return quote(unquote(value).lower(), safe='')
+
+
+def canonical_url(url):
+    """The profile URL the readers yield for `url`'s company, or `url` unchanged for other pages."""
+    slug = canonical_slug(url)
+    return PROFILE_URL_TEMPLATE.format(slug) if slug else url
+
+
+class DigestSet:
+    """Set of strings kept as 64-bit hashes in an open-addressing table.
+
+    About 16 bytes per member instead of ~100 for a set of str. Two different
+    strings sharing a 64-bit hash would be taken for the same one; at a few
+    million members the odds of that are below one in a million.
+    """
+
+    def __init__(self, capacity=1024):
+        size = 1024
+        while size < capacity * 2:
+            size *= 2
+        self._table = array.array('Q', bytes(8 * size))
+        self._mask = size - 1
+        self._count = 0
+
+    @staticmethod
+    def _hash(value):
+        digest = int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+        return digest or 1  # 0 marks an empty slot
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, value):
+        digest = self._hash(value)
+        table, mask = self._table, self._mask
+        i = digest & mask
+        while table[i]:
+            if table[i] == digest:
+                return True
+            i = (i + 1) & mask
+        return False
+
+    def add(self, value):
+        """Adds `value`; returns False if it was already in the set."""
+        return self._add(self._hash(value))
+
+    def _add(self, digest):
+        table, mask = self._table, self._mask
+        i = digest & mask
+        while table[i]:
+            if table[i] == digest:
+                return False
+            i = (i + 1) & mask
+        table[i] = digest
+        self._count += 1
+        if self._count * 2 > len(table):
+            self._grow()
+        return True
+
+    def _grow(self):
+        old = self._table
+        self._table = array.array('Q', bytes(16 * len(old)))
+        self._mask = len(self._table) - 1
+        self._count = 0
+        for digest in old:
+            if digest:
+                self._add(digest)
+
+
+def iter_csv_rows(path, offset=0):
+    """Yields `(row, start, end)` for each CSV row, starting at byte `offset`."""
+    with open(path, 'rb') as f:
+        if offset == 0 and f.read(len(codecs.BOM_UTF8)) == codecs.BOM_UTF8:
+            offset = len(codecs.BOM_UTF8)  # files saved as "UTF-8 with BOM"
+        f.seek(offset)
+        pos = offset
+        for line in f:
+            start = pos
+            pos += len(line)
+            row = next(csv.reader([line.decode('utf-8')]), None)
+            if row:
+                yield row, start, pos
+
+
+class _IncompleteMember(Exception):
+    pass
+
+
+def iter_json_object(path, offset=0, chunk_size=64 * 1024):
+    """Yields `(key, value, start, end)` for the members of a top-level JSON object.
+
+    The file is read in chunks, so memory only holds one chunk and the member
+    being decoded. `offset` must be 0 or a `start` offset yielded earlier.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    expect_open = offset == 0
+    with open(path, 'rb') as f:
+        if offset == 0 and f.read(len(codecs.BOM_UTF8)) == codecs.BOM_UTF8:
+            offset = len(codecs.BOM_UTF8)  # files saved as "UTF-8 with BOM"
+        f.seek(offset)
+        base = offset      # byte offset of buf[pos]
+        buf = ''
+        pos = 0
+        eof = False
+
+        def fill():
+            nonlocal buf, pos, eof
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf = buf[pos:] + utf8.decode(chunk, final=eof)
+            pos = 0
+
+        def consume(n):
+            nonlocal pos, base
+            base += len(buf[pos:n].encode('utf-8'))
+            pos = n
+
+        while True:
+            # skip separators between members
+            while True:
+                i = pos
+                while i < len(buf) and (buf[i] in _WHITESPACE or (buf[i] == ',' and not expect_open)):
+                    i += 1
+                consume(i)
+                if pos < len(buf) or eof:
+                    break
+                fill()
+            if pos >= len(buf):
+                return
+            if expect_open:
+                if buf[pos] != '{':
+                    raise ValueError(f"'{path}' does not contain a JSON object")
+                consume(pos + 1)
+                expect_open = False
+                continue
+            if buf[pos] == '}':
+                return
+
+            # decode `"key": value`, reading more input until it is complete
+            while True:
+                try:
+                    key, p = decoder.raw_decode(buf, pos)
+                    while p < len(buf) and buf[p] in _WHITESPACE:
+                        p += 1
+                    if p >= len(buf):
+                        raise _IncompleteMember
+                    if buf[p] != ':':
+                        raise ValueError(f"Malformed JSON object in '{path}' near byte {base}")
+                    p += 1
+                    while p < len(buf) and buf[p] in _WHITESPACE:
+                        p += 1
+                    value, end = decoder.raw_decode(buf, p)
+                    # a number at the end of the buffer may still be growing
+                    if end >= len(buf) and not eof:
+                        raise _IncompleteMember
+                    break
+                except (json.JSONDecodeError, _IncompleteMember):
+                    if eof:
+                        raise ValueError(f"Truncated JSON object in '{path}' near byte {base}")
+                    fill()
+            start = base
+            consume(end)
+            yield key, value, start, base
+
+
+def iter_company_ids(path, offset=0):
+    for row, start, end in iter_csv_rows(path, offset):
+        slug = canonical_slug(row[0])
+        if slug:
+            yield PROFILE_URL_TEMPLATE.format(slug), start, end
+
+
+def iter_company_names(path, offset=0):
+    # other pages (e.g. /school/...) are skipped, as `merge_inputs` does
+    for _name, url, start, end in iter_json_object(path, offset):
+        slug = canonical_slug(url) if isinstance(url, str) else None
+        if slug:
+            yield PROFILE_URL_TEMPLATE.format(slug), start, end
+
+
+def iter_input_urls(path, offset=0):
+    """Profile URLs of a `company_ids` CSV or a `company_names` JSON input."""
+    if path.endswith('.json'):
+        return iter_company_names(path, offset)
+    return iter_company_ids(path, offset)
+
+
+def iter_input_values(path):
+    """The raw entries of an input file: the first column of a CSV, the values of a JSON dict."""
+    if path.endswith('.json'):
+        for _name, value, _start, _end in iter_json_object(path):
+            if isinstance(value, str):
+                yield value
+    else:
+        for row, _start, _end in iter_csv_rows(path):
+            yield row[0]
+
+
+def merge_inputs(sources, destination, run_size=100_000):
+    """Writes the canonical slugs of all `sources`, deduplicated and sorted, as a one-column CSV.
+
+    Sources are streamed, duplicates across them are dropped as they are read
+    (see DigestSet), and the unique slugs are sorted in runs of `run_size`
+    that are merged into `destination`, so memory stays bounded by the hash
+    set and one run. Returns `{source: {'rows', 'unique', 'duplicates', 'skipped'}}`.
+    """
+    seen = DigestSet()
+    stats = {}
+    directory = os.path.dirname(os.path.abspath(destination))
+    with tempfile.TemporaryDirectory(prefix='merge-inputs-', dir=directory) as tmp_dir:
+        runs = []
+        buffer = []
+
+        def spill():
+            buffer.sort()
+            run_path = os.path.join(tmp_dir, f'run-{len(runs):05d}.txt')
+            with open(run_path, 'w', encoding='utf-8') as f:
+                f.writelines(slug + '\n' for slug in buffer)
+            runs.append(run_path)
+            buffer.clear()
+
+        for path in sources:
+            counts = stats[path] = {'rows': 0, 'unique': 0, 'duplicates': 0, 'skipped': 0}
+            for value in iter_input_values(path):
+                counts['rows'] += 1
+                slug = canonical_slug(value)
+                if slug is None:
+                    counts['skipped'] += 1
+                elif seen.add(slug):
+                    counts['unique'] += 1
+                    buffer.append(slug)
+                    if len(buffer) >= run_size:
+                        spill()
+                else:
+                    counts['duplicates'] += 1
+
+        buffer.sort()
+        files = [open(run_path, 'r', encoding='utf-8') for run_path in runs]
+        try:
+            tmp_path = destination + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as out:
+                writer = csv.writer(out, quoting=csv.QUOTE_ALL, lineterminator='\n')
+                last = None
+                for slug in heapq.merge(buffer, *((line.rstrip('\n') for line in f) for f in files)):
+                    if slug != last:
+                        writer.writerow([slug])
+                        last = slug
+            os.replace(tmp_path, destination)
+        finally:
+            for f in files:
+                f.close()
+    return stats
+
+
+class InputCursor:
+    """Byte offset (and row count) per input file where the next run should resume.
+
+    Each position is saved with the size and mtime of the file and a hash of
+    its first block and of the block before the offset. The offset is only
+    trusted while the file is unchanged, or if it only grew and both blocks
+    still match (rows appended); any other rewrite restarts the file from the top.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.positions = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                try:
+                    self.positions = json.load(f)
+                except json.JSONDecodeError:
+                    self.positions = {}
+
+    def get(self, source):
+        """Returns `(offset, rows)` for `source`, or `(0, 0)` if it changed or is new."""
+        position = self.positions.get(source)
+        if not position or 'size' not in position or not os.path.exists(source):
+            return 0, 0
+        stat = os.stat(source)
+        if (stat.st_size, stat.st_mtime_ns) != (position['size'], position['mtime_ns']):
+            if stat.st_size < position['size'] or _blocks_hash(source, position['offset']) != position['blocks']:
+                return 0, 0
+        return position['offset'], position['rows']
+
+    def set(self, source, offset, rows):
+        stat = os.stat(source)
+        self.positions[source] = {'offset': offset, 'rows': rows, 'size': stat.st_size,
+                                  'mtime_ns': stat.st_mtime_ns, 'blocks': _blocks_hash(source, offset)}
+
+    def forget(self, source):
+        """Drops the position of `source` (under any path naming it), e.g. after the file was rewritten."""
+        path = os.path.abspath(source)
+        for name in [name for name in self.positions if os.path.abspath(name) == path]:
+            del self.positions[name]
+
+    def reset(self):
+        self.positions = {}
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.positions, f, indent=4)
+        os.replace(tmp_path, self.path)
+
+
+def _blocks_hash(path, offset, size=4096):
+    # hash of the first block of the file and of the block that ends at `offset`
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        digest.update(f.read(size))
+        f.seek(max(0, offset - size))
+        digest.update(f.read(min(offset, size)))
+    return digest.hexdigest()
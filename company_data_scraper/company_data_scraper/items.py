@@ -2,11 +2,74 @@
 #
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
+import re
+import sys
+from dataclasses import dataclass, fields
 
-import scrapy
+# values extract_company_profile uses for a field it could not find
+MISSING_VALUES = ('not-found', '', None)
+YEAR_RE = re.compile(r'\b(1[5-9]\d\d|20\d\d)\b')
 
+# fields that repeat the same few hundred strings across a crawl
+CATEGORICAL_FIELDS = ('industry', 'company_size_approx', 'headquarters', 'type')
 
-class CompanyDataScraperItem(scrapy.Item):
-    # define the fields for your item here like:
-    # name = scrapy.Field()
-    pass
+
+@dataclass(slots=True)
+class CompanyProfileItem:
+    """A company profile with a fixed set of typed fields (None when missing).
+
+    Slotted, so a buffered row costs a fraction of a dict, and the categorical
+    fields are interned, so every row shares one copy of each value.
+    """
+    company_url: str
+    company_name: str
+    linkedin_followers_count: int | None = None
+    company_logo_url: str | None = None
+    about_us: str | None = None
+    num_of_employees: int | None = None
+    website: str | None = None
+    industry: str | None = None
+    company_size_approx: str | None = None
+    headquarters: str | None = None
+    type: str | None = None
+    founded: int | None = None
+    specialties: str | None = None
+
+    @classmethod
+    def from_profile(cls, profile):
+        """Builds an item from an `extract_company_profile()` dict.
+
+        Keys outside the schema (the extraction stores the label of the sixth
+        detail block under its own name) are dropped.
+        """
+        values = {}
+        for name in FIELD_NAMES:
+            value = profile.get(name)
+            if value in MISSING_VALUES:
+                value = None
+            elif name in CATEGORICAL_FIELDS:
+                value = sys.intern(value)
+            values[name] = value
+        values['founded'] = _parse_year(values['founded'])
+        return cls(**values)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in FIELD_NAMES}
+
+
+FIELD_NAMES = tuple(field.name for field in fields(CompanyProfileItem))
+
+
+@dataclass(slots=True)
+class CompanyListingItem:
+    """One company of the LinkedIn directory, under its canonical slug and profile URL."""
+    company_name: str | None
+    company_slug: str
+    company_url: str
+
+
+def _parse_year(value):
+    if value is None or isinstance(value, int):
+        return value
+    match = YEAR_RE.search(value)
+    return int(match.group()) if match else None
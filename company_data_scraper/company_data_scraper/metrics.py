@@ -0,0 +1,146 @@
+# metrics.py
+#
+# In-process metrics for a crawl, filled in by the project middlewares and
+# CompanyProfilePipeline and exported by extensions.MetricsExporter.
+#
+# Timings go into histograms with fixed buckets (like Prometheus), so the
+# hot path only does a bisect and two additions per observation. Counters
+# carry optional labels, e.g. `responses_total{status=200}`.
+import bisect
+import collections
+import time
+
+from company_data_scraper.items import MISSING_VALUES
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimate of the `q` quantile, interpolated inside its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else None,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+        }
+
+
+class Metrics:
+
+    def __init__(self):
+        self.started = time.time()
+        self.counters = collections.Counter()   # (name, labels) -> value
+        self.histograms = {}
+        self.items = 0
+        self.fields = collections.Counter()     # field -> items where it was filled
+        self.field_items = collections.Counter()  # field -> items that had the field
+
+    def inc(self, name, labels=(), value=1):
+        self.counters[name, labels] += value
+
+    def observe(self, name, value):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def record_item(self, item):
+        self.items += 1
+        for field, value in item.items():
+            self.field_items[field] += 1
+            if value not in MISSING_VALUES:
+                self.fields[field] += 1
+
+    def fill_rates(self):
+        """Share of items per field that had a value (not 'not-found' or empty)."""
+        return {field: self.fields[field] / count for field, count in sorted(self.field_items.items())}
+
+    def snapshot(self):
+        elapsed = time.time() - self.started
+        return {
+            'time': time.time(),
+            'elapsed': elapsed,
+            'items': self.items,
+            'items_per_second': self.items / elapsed if elapsed else 0.0,
+            'counters': {_name(name, labels): value for (name, labels), value in sorted(self.counters.items())},
+            'histograms': {name: histogram.summary() for name, histogram in sorted(self.histograms.items())},
+            'fill_rate': self.fill_rates(),
+        }
+
+    def to_prometheus(self, prefix='scraper_'):
+        """The metrics in the Prometheus text exposition format."""
+        lines = []
+        lines.append(f'# TYPE {prefix}items_total counter')
+        lines.append(f'{prefix}items_total {self.items}')
+        elapsed = time.time() - self.started
+        lines.append(f'# TYPE {prefix}items_per_second gauge')
+        lines.append(f'{prefix}items_per_second {self.items / elapsed if elapsed else 0.0}')
+
+        declared = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f'# TYPE {prefix}{name} counter')
+            lines.append(f'{prefix}{name}{_labels(labels)} {value}')
+
+        for name, histogram in sorted(self.histograms.items()):
+            lines.append(f'# TYPE {prefix}{name} histogram')
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append(f'{prefix}{name}_bucket{_labels((("le", bound),))} {cumulative}')
+            lines.append(f'{prefix}{name}_sum {histogram.sum}')
+            lines.append(f'{prefix}{name}_count {histogram.count}')
+
+        lines.append(f'# TYPE {prefix}field_fill_ratio gauge')
+        for field, rate in self.fill_rates().items():
+            lines.append(f'{prefix}field_fill_ratio{_labels((("field", field),))} {rate}')
+        return '\n'.join(lines) + '\n'
+
+
+def _name(name, labels):
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}={value}' for key, value in labels) + '}'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+def metrics_for(crawler):
+    """The Metrics of a crawl, shared by the middlewares, the pipeline and the exporter."""
+    metrics = getattr(crawler, 'metrics', None)
+    if metrics is None:
+        metrics = crawler.metrics = Metrics()
+    return metrics
@@ -2,102 +2,204 @@
 #
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
+import time
 
 from scrapy import signals
+from scrapy.exceptions import NotConfigured
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
 
+from company_data_scraper.archive import PageArchiveWriter
+from company_data_scraper.metrics import metrics_for
+from company_data_scraper.ratelimit import RateBudget, parse_retry_after
+
 
 class CompanyDataScraperSpiderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the spider middleware does not modify the
-    # passed objects.
+    # Times the spider callbacks (parse_response) and records how well the
+    # extraction fills each item field, so a silent drop in quality shows up
+    # in the metrics. It sits closest to the spider, so only callback time is
+    # measured, not the other middlewares.
+
+    def __init__(self, metrics):
+        self.metrics = metrics
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
+        if not crawler.settings.getbool('METRICS_ENABLED'):
+            raise NotConfigured
+        s = cls(metrics_for(crawler))
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
         return s
 
-    def process_spider_input(self, response, spider):
-        # Called for each response that goes through the spider
-        # middleware and into the spider.
+    def process_spider_output(self, response, result, spider):
+        elapsed = 0.0
+        items = 0
+        result = iter(result)
+        while True:
+            start = time.perf_counter()
+            try:
+                output = next(result)
+            except StopIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - start
+            if is_item(output):
+                items += 1
+                self.metrics.record_item(ItemAdapter(output))
+            yield output
+        self._record_response(response, elapsed, items)
+
+    async def process_spider_output_async(self, response, result, spider):
+        elapsed = 0.0
+        items = 0
+        result = result.__aiter__()
+        while True:
+            start = time.perf_counter()
+            try:
+                output = await result.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - start
+            if is_item(output):
+                items += 1
+                self.metrics.record_item(ItemAdapter(output))
+            yield output
+        self._record_response(response, elapsed, items)
+
+    def _record_response(self, response, elapsed, items):
+        self.metrics.observe('parse_seconds', elapsed)
+        if response.status == 200 and not items:
+            # a page that rendered but yielded no profile (e.g. no company name found)
+            self.metrics.inc('pages_without_item_total')
 
-        # Should return None or raise an exception.
-        return None
+    def spider_opened(self, spider):
+        spider.logger.info("Spider opened: %s" % spider.name)
 
-    def process_spider_output(self, response, result, spider):
-        # Called with the results returned from the Spider, after
-        # it has processed the response.
 
-        # Must return an iterable of Request, or item objects.
-        for i in result:
-            yield i
+class CompanyDataScraperDownloaderMiddleware:
+    # Counts requests, retries, response status codes (redirects and 429s
+    # included, before RedirectMiddleware and RetryMiddleware act on them)
+    # and download errors, and records the download latency.
 
-    def process_spider_exception(self, response, exception, spider):
-        # Called when a spider or process_spider_input() method
-        # (from other spider middleware) raises an exception.
+    def __init__(self, metrics):
+        self.metrics = metrics
 
-        # Should return either None or an iterable of Request or item objects.
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('METRICS_ENABLED'):
+            raise NotConfigured
+        s = cls(metrics_for(crawler))
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        return s
+
+    def process_request(self, request, spider):
+        self.metrics.inc('requests_total')
+        if request.meta.get('retry_times'):
+            self.metrics.inc('retries_total')
         return None
 
-    def process_start_requests(self, start_requests, spider):
-        # Called with the start requests of the spider, and works
-        # similarly to the process_spider_output() method, except
-        # that it doesn’t have a response associated.
+    def process_response(self, request, response, spider):
+        self.metrics.inc('responses_total', (('status', response.status),))
+        if 300 <= response.status < 400:
+            self.metrics.inc('redirects_total')
+        latency = request.meta.get('download_latency')
+        if latency is not None:
+            self.metrics.observe('download_latency_seconds', latency)
+        return response
 
-        # Must return only requests (not items).
-        for r in start_requests:
-            yield r
+    def process_exception(self, request, exception, spider):
+        self.metrics.inc('download_errors_total', (('exception', type(exception).__name__),))
+        return None
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
 
 
-class CompanyDataScraperDownloaderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the downloader middleware does not modify the
-    # passed objects.
+class RateBudgetMiddleware:
+    # Paces every download with a shared RateBudget (see ratelimit.py). It sits
+    # right in front of the downloader, so it sees each real fetch (retries and
+    # redirects included) and the raw 429/503 responses before RetryMiddleware.
+
+    def __init__(self, budget, stats=None):
+        self.budget = budget
+        self.stats = stats
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
-        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        settings = crawler.settings
+        if not settings.getbool('RATE_BUDGET_ENABLED'):
+            raise NotConfigured
+        budget = RateBudget(
+            rate=settings.getfloat('RATE_BUDGET_RPS', 0.5),
+            burst=settings.getint('RATE_BUDGET_BURST', 1),
+            max_concurrency=settings.getint('CONCURRENT_REQUESTS', 8),
+            target_latency=settings.getfloat('RATE_BUDGET_TARGET_LATENCY', 2.0),
+        )
+        s = cls(budget, crawler.stats)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
         return s
 
-    def process_request(self, request, spider):
-        # Called for each request that goes through the downloader
-        # middleware.
-
-        # Must either:
-        # - return None: continue processing this request
-        # - or return a Response object
-        # - or return a Request object
-        # - or raise IgnoreRequest: process_exception() methods of
-        #   installed downloader middleware will be called
+    async def process_request(self, request, spider):
+        await self.budget.acquire()
+        request.meta['rate_budget_slot'] = True
         return None
 
     def process_response(self, request, response, spider):
-        # Called with the response returned from the downloader.
-
-        # Must either;
-        # - return a Response object
-        # - return a Request object
-        # - or raise IgnoreRequest
+        if request.meta.pop('rate_budget_slot', False):
+            self.budget.release()
+            self.budget.record(
+                response.status,
+                latency=request.meta.get('download_latency'),
+                retry_after=parse_retry_after(response.headers.get('Retry-After')),
+            )
         return response
 
     def process_exception(self, request, exception, spider):
-        # Called when a download handler or a process_request()
-        # (from other downloader middleware) raises an exception.
-
-        # Must either:
-        # - return None: continue processing this exception
-        # - return a Response object: stops process_exception() chain
-        # - return a Request object: stops process_exception() chain
+        if request.meta.pop('rate_budget_slot', False):
+            self.budget.release()
         return None
 
-    def spider_opened(self, spider):
-        spider.logger.info("Spider opened: %s" % spider.name)
+    def spider_closed(self, spider):
+        budget = self.budget
+        if self.stats is not None:
+            self.stats.set_value('rate_budget/throttled', budget.throttled)
+            self.stats.set_value('rate_budget/final_rate', budget.rate)
+            self.stats.set_value('rate_budget/final_concurrency', int(budget.concurrency))
+        print(f" >  Rate budget: {budget.throttled} throttled responses, ended at "
+              f"{budget.rate:.2f} req/s and {int(budget.concurrency)} concurrent requests")
+
+
+class PageArchiveMiddleware:
+    # Stores every downloaded page (decompressed, after redirects) in the
+    # page archive, so `scrapy reparse` can re-run extraction offline.
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('PAGE_ARCHIVE_ENABLED'):
+            raise NotConfigured
+        writer = PageArchiveWriter(
+            settings.get('PAGE_ARCHIVE_DIR', 'page_archive'),
+            max_segment_bytes=settings.getint('PAGE_ARCHIVE_SEGMENT_MAX_BYTES', 256 * 1024 * 1024),
+            flush_interval=settings.getfloat('PAGE_ARCHIVE_FLUSH_INTERVAL', 5.0),
+        )
+        s = cls(writer)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def process_response(self, request, response, spider):
+        headers = {
+            name.decode('latin-1'): [value.decode('latin-1') for value in values]
+            for name, values in response.headers.items()
+        }
+        self.writer.write(response.url, response.status, headers, response.body,
+                          company_url=request.meta.get('company_url'))
+        return response
+
+    def spider_closed(self, spider):
+        self.writer.close()
@@ -1,35 +1,247 @@
 # pipelines.py
+import csv
 import json
 import os
+import time
+
+from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task
+
+from company_data_scraper.columnar import ParquetProfileWriter
+from company_data_scraper.index import open_scraped_index
+from company_data_scraper.inputs import InputCursor, merge_inputs
+from company_data_scraper.items import CompanyListingItem, CompanyProfileItem
+from company_data_scraper.metrics import metrics_for
+from company_data_scraper.storage import JsonlShardWriter
+
 
 class CompanyProfilePipeline:
-    scraped_urls = set()  # Make scraped_urls globally accessible to the spider
+
+    def __init__(self, settings, output_mode='json', output_file='company_profile_data.json',
+                 output_dir='company_profile_data', shard_max_bytes=64 * 1024 * 1024,
+                 shard_max_seconds=3600, compression=None, flush_interval=5.0, metrics=None):
+        if output_mode not in ('json', 'jsonl'):
+            raise ValueError(f"PROFILE_OUTPUT_MODE must be 'json' or 'jsonl', got {output_mode!r}")
+        self.settings = settings
+        self.output_mode = output_mode
+        self.output_file = output_file
+        self.output_dir = output_dir
+        self.shard_max_bytes = shard_max_bytes
+        self.shard_max_seconds = shard_max_seconds
+        self.compression = compression
+        self.flush_interval = flush_interval
+        self.metrics = metrics
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        pipeline = cls(
+            settings,
+            output_mode=settings.get('PROFILE_OUTPUT_MODE', 'json'),
+            output_file=settings.get('PROFILE_OUTPUT_FILE', 'company_profile_data.json'),
+            output_dir=settings.get('PROFILE_OUTPUT_DIR', 'company_profile_data'),
+            shard_max_bytes=settings.getint('PROFILE_SHARD_MAX_BYTES', 64 * 1024 * 1024),
+            shard_max_seconds=settings.getfloat('PROFILE_SHARD_MAX_SECONDS', 3600),
+            compression=settings.get('PROFILE_OUTPUT_COMPRESSION') or None,
+            flush_interval=settings.getfloat('PROFILE_FLUSH_INTERVAL', 5.0),
+            metrics=metrics_for(crawler) if settings.getbool('METRICS_ENABLED') else None,
+        )
+        crawler.signals.connect(pipeline.spider_idle, signal=signals.spider_idle)
+        return pipeline
 
     def open_spider(self, spider):
-        self.output_file = 'company_profile_data.json'
-        
+        # URLs already written (this run or earlier ones) live in the on-disk index.
+        # Share the spider's connection, so the page state it records is
+        # committed together with the items written here.
+        self.owns_index = getattr(spider, 'scraped_index', None) is None
+        self.scraped_index = open_scraped_index(self.settings) if self.owns_index else spider.scraped_index
+
+        if self.output_mode == 'jsonl':
+            # Items are streamed to disk as they arrive
+            self.writer = JsonlShardWriter(
+                self.output_dir,
+                max_bytes=self.shard_max_bytes,
+                max_seconds=self.shard_max_seconds,
+                compression=self.compression,
+                flush_interval=self.flush_interval,
+            )
+            # write() only flushes when items arrive; this also covers a crawl gone quiet
+            self.flusher = None
+            if self.flush_interval > 0:
+                self.flusher = task.LoopingCall(self.flush)
+                self.flusher.start(self.flush_interval, now=False)
+            return
+
         # Load existing data if available
         if os.path.exists(self.output_file):
             with open(self.output_file, 'r') as f:
                 try:
                     existing_data = json.load(f)
-                    # Populate `scraped_urls` with URLs that have already been scraped
-                    CompanyProfilePipeline.scraped_urls = {item['company_url'] for item in existing_data}
                 except json.JSONDecodeError:
                     existing_data = []
         else:
             existing_data = []
         # Track all scraped data
         self.existing_data = existing_data
+        self.dirty = False
+        self.positions = None  # company_url -> index in existing_data, built on the first refreshed item
+
+    def process_item(self, item, spider):
+        start = time.perf_counter()
+        # Only add new items (or new versions from a refresh crawl) to avoid duplicates
+        company_url = ItemAdapter(item)['company_url']
+        refreshed = self.scraped_index.is_staged(company_url)
+        if refreshed or company_url not in self.scraped_index:
+            self.scraped_index.add(company_url)
+            if self.output_mode == 'jsonl':
+                # commit the index only once the items it covers are fsynced;
+                # readers keep the last record of a company_url
+                if self.writer.write(_as_record(item)):
+                    self.scraped_index.commit()
+            elif refreshed:
+                self._replace_item(company_url, _buffered(item))
+                self.dirty = True
+            else:
+                self.existing_data.append(_buffered(item))
+                self.dirty = True
+        if self.metrics is not None:
+            self.metrics.observe('pipeline_seconds', time.perf_counter() - start)
+        return item
+
+    def _replace_item(self, company_url, item):
+        if self.positions is None:
+            self.positions = {ItemAdapter(record).get('company_url'): i for i, record in enumerate(self.existing_data)}
+        position = self.positions.get(company_url)
+        if position is None:
+            self.positions[company_url] = len(self.existing_data)
+            self.existing_data.append(item)
+        else:
+            self.existing_data[position] = item
+
+    def spider_idle(self, spider):
+        # Nothing is in flight: make the items so far durable and commit the index, so the spider
+        # can advance its cursor and complete its work queue leases while it waits
+        if self.output_mode == 'jsonl':
+            self.flush()
+        elif self.dirty:
+            self._save_json()
+            self.scraped_index.commit()
+
+    def flush(self):
+        # fsync the shard, then commit the index entries of the items in it
+        self.writer.flush()
+        self.scraped_index.commit()
+
+    def _save_json(self):
+        # a kill while writing must not truncate the dataset the index already covers
+        tmp_path = self.output_file + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.existing_data, f, indent=4, default=_as_record)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.output_file)
+        self.dirty = False
+
+    def close_spider(self, spider):
+        if self.output_mode == 'jsonl':
+            if self.flusher is not None and self.flusher.running:
+                self.flusher.stop()
+            self.writer.close()
+        else:
+            # Save data to the JSON file when the spider closes
+            self._save_json()
+        if self.owns_index:
+            self.scraped_index.close()
+        else:
+            self.scraped_index.commit()
+
+
+class ParquetExportPipeline:
+    # Also writes the items to a Parquet dataset (see columnar.py), when PARQUET_EXPORT_ENABLED is set.
+    # Each run adds its own files to PARQUET_CRAWL_OUTPUT_DIR, apart from the `export_parquet` dataset.
+
+    def __init__(self, output_dir='company_profile_parquet_crawl', partition_by=None, row_group_size=50_000,
+                 compression='zstd'):
+        self.output_dir = output_dir
+        self.partition_by = partition_by
+        self.row_group_size = row_group_size
+        self.compression = compression
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('PARQUET_EXPORT_ENABLED'):
+            raise NotConfigured
+        return cls(
+            output_dir=settings.get('PARQUET_CRAWL_OUTPUT_DIR', 'company_profile_parquet_crawl'),
+            partition_by=settings.get('PARQUET_PARTITION_BY') or None,
+            row_group_size=settings.getint('PARQUET_ROW_GROUP_SIZE', 50_000),
+            compression=settings.get('PARQUET_COMPRESSION', 'zstd'),
+        )
+
+    def open_spider(self, spider):
+        self.writer = ParquetProfileWriter(self.output_dir, partition_by=self.partition_by,
+                                           row_group_size=self.row_group_size, compression=self.compression)
+
+    def process_item(self, item, spider):
+        self.writer.write(item if isinstance(item, CompanyProfileItem) else ItemAdapter(item).asdict())
+        return item
+
+    def close_spider(self, spider):
+        self.writer.close()
+        print(f" >  Wrote {self.writer.rows_written} rows to the Parquet dataset in {self.output_dir}")
+
+
+class DirectoryInputPipeline:
+    # Merges the slugs found by the directory spider into the profile spider's input file
+    # (DIRECTORY_INPUT_PATH, sorted and deduplicated like `scrapy merge_inputs` output)
+
+    def __init__(self, input_path='company_slugs.csv', cursor_path='input_cursor.json'):
+        self.input_path = input_path
+        self.spool_path = input_path + '.new'
+        self.cursor_path = cursor_path
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        input_path = crawler.settings.get('DIRECTORY_INPUT_PATH')
+        if not input_path:
+            raise NotConfigured
+        return cls(input_path, crawler.settings.get('INPUT_CURSOR_PATH', 'input_cursor.json'))
+
+    def open_spider(self, spider):
+        # slugs are spooled to disk as they arrive and merged in one pass at the end
+        self.spool = open(self.spool_path, 'w', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.spool, quoting=csv.QUOTE_ALL, lineterminator='\n')
+        self.listings = 0
 
     def process_item(self, item, spider):
-        # Only add new items to avoid duplicates
-        if item['company_url'] not in CompanyProfilePipeline.scraped_urls:
-            self.existing_data.append(dict(item))
-            CompanyProfilePipeline.scraped_urls.add(item['company_url'])
+        if isinstance(item, CompanyListingItem):
+            self.writer.writerow([item.company_slug])
+            self.listings += 1
         return item
 
     def close_spider(self, spider):
-        # Save data to the JSON file when the spider closes
-        with open(self.output_file, 'w') as f:
-            json.dump(self.existing_data, f, indent=4)
+        self.spool.close()
+        sources = [self.input_path] if os.path.exists(self.input_path) else []
+        stats = merge_inputs(sources + [self.spool_path], self.input_path)
+        os.remove(self.spool_path)
+        # new slugs are merged in anywhere in the file, so the profile spider starts it over
+        cursor = InputCursor(self.cursor_path)
+        cursor.forget(self.input_path)
+        cursor.save()
+        added = stats[self.spool_path]['unique']
+        total = sum(counts['unique'] for counts in stats.values())
+        print(f" >  Added {added} of {self.listings} directory companies to {self.input_path} ({total} in total)")
+
+
+def _buffered(item):
+    # typed items stay slotted in the buffer, anything else is copied into a dict
+    return item if isinstance(item, CompanyProfileItem) else dict(item)
+
+
+def _as_record(item):
+    if isinstance(item, CompanyProfileItem):
+        return item.to_dict()
+    return dict(item)
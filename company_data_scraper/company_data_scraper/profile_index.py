@@ -0,0 +1,239 @@
+# profile_index.py
+#
+# On-disk query index over the profile output, for questions like "software
+# companies headquartered in Paris with more than 500 employees, by
+# followers" without loading the dataset.
+#
+# It is an SQLite file with one row per company (the latest record, stored
+# zlib-compressed, plus its numeric columns with a B-tree index each) and an
+# inverted index of the words in industry, headquarters, type and
+# specialties. Text filters match records having every word of the query in
+# that field and numeric filters are ranges. A query starts from its most
+# selective filter (or, for a top-K query, the index of the sort column) and
+# checks the others with one B-tree lookup each.
+#
+# Updates are incremental: the index remembers the size and mtime of every
+# output file it read, and only re-reads the legacy JSON file or a shard when
+# it changed. Shards only grow, so if an indexed file shrinks or disappears
+# (e.g. after `merge_output`) the index is rebuilt from scratch.
+import json
+import os
+import re
+import sqlite3
+import zlib
+
+from company_data_scraper.items import YEAR_RE
+from company_data_scraper.storage import iter_legacy_records, iter_shard_records, list_shards
+
+TEXT_FIELDS = ('industry', 'headquarters', 'type', 'specialties')
+NUMERIC_FIELDS = {
+    'followers': 'linkedin_followers_count',
+    'employees': 'num_of_employees',
+    'founded': 'founded',
+}
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokens(text):
+    """The lowercased words of `text`, each once."""
+    if not isinstance(text, str):
+        return set()
+    return set(TOKEN_RE.findall(text.lower()))
+
+
+def _as_int(value, year=False):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if not isinstance(value, str):
+        return None
+    if year:
+        match = YEAR_RE.search(value)
+        return int(match.group()) if match else None
+    digits = value.replace(',', '').strip()
+    return int(digits) if digits.isdigit() else None
+
+
+def _postings(record, profile_id):
+    return [(field, token, profile_id) for field, name in enumerate(TEXT_FIELDS) for token in tokens(record.get(name))]
+
+
+class ProfileIndex:
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS profiles (id INTEGER PRIMARY KEY, company_url TEXT UNIQUE,'
+            ' version TEXT, followers INTEGER, employees INTEGER, founded INTEGER, record BLOB)'
+        )
+        for column in NUMERIC_FIELDS:
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS profiles_{column} ON profiles ({column})')
+        # field is the position in TEXT_FIELDS
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS postings (field INTEGER, token TEXT, id INTEGER,'
+            ' PRIMARY KEY (field, token, id)) WITHOUT ROWID'
+        )
+        self.conn.execute('CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, size INTEGER, mtime REAL)')
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM profiles').fetchone()[0]
+
+    def update(self, output_file, output_dir):
+        """Indexes what changed in the output since the last update; returns the records read."""
+        sources = []
+        if os.path.exists(output_file):
+            # the legacy file is older than any shard, so its versions sort first
+            sources.append((output_file, '', iter_legacy_records))
+        sources += [(path, os.path.basename(path), iter_shard_records) for path in list_shards(output_dir)]
+
+        known = dict((path, (size, mtime)) for path, size, mtime in self.conn.execute('SELECT * FROM sources'))
+        current = {path: os.stat(path) for path, _key, _reader in sources}
+        if any(path not in current or current[path].st_size < size for path, (size, _mtime) in known.items()):
+            self._clear()
+            known = {}
+
+        read = 0
+        for path, key, reader in sources:
+            stat = current[path]
+            if known.get(path) == (stat.st_size, stat.st_mtime):
+                continue
+            for position, record in enumerate(reader(path)):
+                self._upsert(record, f'{key}:{position:012d}')
+                read += 1
+            self.conn.execute('INSERT OR REPLACE INTO sources (path, size, mtime) VALUES (?, ?, ?)',
+                              (path, stat.st_size, stat.st_mtime))
+            self.conn.commit()
+        return read
+
+    def _clear(self):
+        self.conn.execute('DELETE FROM postings')
+        self.conn.execute('DELETE FROM profiles')
+        self.conn.execute('DELETE FROM sources')
+
+    def _upsert(self, record, version):
+        company_url = record.get('company_url')
+        if company_url is None:
+            return
+        row = self.conn.execute('SELECT id, version, record FROM profiles WHERE company_url = ?',
+                                (company_url,)).fetchone()
+        if row is not None and row[1] > version:
+            return  # a later record of this company is indexed already
+        values = (
+            version,
+            _as_int(record.get('linkedin_followers_count')),
+            _as_int(record.get('num_of_employees')),
+            _as_int(record.get('founded'), year=True),
+            zlib.compress(json.dumps(record).encode('utf-8')),
+        )
+        if row is None:
+            profile_id = self.conn.execute(
+                'INSERT INTO profiles (company_url, version, followers, employees, founded, record)'
+                ' VALUES (?, ?, ?, ?, ?, ?)', (company_url,) + values).lastrowid
+        else:
+            profile_id = row[0]
+            self.conn.execute('UPDATE profiles SET version = ?, followers = ?, employees = ?, founded = ?,'
+                              ' record = ? WHERE id = ?', values + (profile_id,))
+            self.conn.executemany('DELETE FROM postings WHERE field = ? AND token = ? AND id = ?',
+                                  _postings(json.loads(zlib.decompress(row[2])), profile_id))
+        self.conn.executemany('INSERT OR IGNORE INTO postings (field, token, id) VALUES (?, ?, ?)',
+                              _postings(record, profile_id))
+
+    def _select(self, columns, text=None, ranges=None, sort=None, limit=None):
+        """SQL and parameters selecting `columns` of the profiles matching the filters of `query()`.
+
+        The query is driven by whichever is cheapest: the shortest postings
+        list of a query word, the narrowest numeric range, or (for a top-K
+        query) the index of the sort column, read until K rows matched.
+        """
+        words = []
+        for field, value in (text or {}).items():
+            if field not in TEXT_FIELDS:
+                raise ValueError(f"Unknown text field {field!r} (use one of {', '.join(TEXT_FIELDS)})")
+            values = [value] if isinstance(value, str) else value
+            field_words = set().union(*(tokens(v) for v in values))
+            if not field_words:
+                raise ValueError(f"No words to look up in the {field} filter {value!r}")
+            words += [(TEXT_FIELDS.index(field), word) for word in sorted(field_words)]
+        range_conditions = {}
+        for column, (low, high) in (ranges or {}).items():
+            if column not in NUMERIC_FIELDS:
+                raise ValueError(f"Unknown numeric field {column!r} (use one of {', '.join(NUMERIC_FIELDS)})")
+            conditions, params = [], []
+            if low is not None:
+                conditions.append(f'p.{column} >= ?')
+                params.append(low)
+            if high is not None:
+                conditions.append(f'p.{column} <= ?')
+                params.append(high)
+            if conditions:
+                range_conditions[column] = (conditions, params)
+
+        # rows each access path would read, counted only as far as the best one so far
+        driver = None
+        paths = [('FROM profiles AS p WHERE ' + ' AND '.join(conditions), params, 'range', column)
+                 for column, (conditions, params) in range_conditions.items()]
+        paths += [('FROM postings WHERE field = ? AND token = ?', word, 'word', word) for word in words]
+        for sql, params, kind, key in paths:
+            cap = driver[0] if driver is not None else -1
+            rows = self.conn.execute(f'SELECT COUNT(*) FROM (SELECT 1 {sql} LIMIT ?)', list(params) + [cap]).fetchone()[0]
+            if driver is None or rows < driver[0]:
+                driver = (rows, kind, key)
+        if sort is not None and limit:
+            total = len(self)
+            matches = driver[0] if driver is not None else total
+            # scanning the sort index in order, about total / matches rows per match
+            if driver is None or limit * total / max(1, matches) < matches:
+                driver = (None, 'sort', sort)
+
+        conditions, params = [], []
+        if driver is not None and driver[1] == 'word':
+            sql = f'SELECT {columns} FROM postings AS first CROSS JOIN profiles AS p ON p.id = first.id'
+            conditions.append('first.field = ? AND first.token = ?')
+            params += list(driver[2])
+            words.remove(driver[2])
+        elif driver is not None:
+            sql = f'SELECT {columns} FROM profiles AS p INDEXED BY profiles_{driver[2]}'
+        else:
+            sql = f'SELECT {columns} FROM profiles AS p'
+        for word in words:
+            conditions.append('EXISTS (SELECT 1 FROM postings WHERE field = ? AND token = ? AND id = p.id)')
+            params += list(word)
+        for column_conditions, column_params in range_conditions.values():
+            conditions += column_conditions
+            params += column_params
+        if sort is not None:
+            conditions.append(f'p.{sort} IS NOT NULL')
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        return sql, params
+
+    def query(self, text=None, ranges=None, sort=None, descending=True, limit=None):
+        """Yields the matching records.
+
+        `text` maps a text field to a string (or several) whose words must all
+        be in the field, `ranges` maps followers/employees/founded to an
+        inclusive `(min, max)` with None for an open end. With `sort`, the
+        records come ordered by that numeric field, leaving out the ones without it.
+        """
+        if sort is not None and sort not in NUMERIC_FIELDS:
+            raise ValueError(f"Cannot sort by {sort!r} (use one of {', '.join(NUMERIC_FIELDS)})")
+        sql, params = self._select('p.record', text, ranges, sort, limit)
+        if sort is not None:
+            sql += f' ORDER BY p.{sort} {"DESC" if descending else "ASC"}'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        for (record,) in self.conn.execute(sql, params):
+            yield json.loads(zlib.decompress(record))
+
+    def count(self, text=None, ranges=None):
+        sql, params = self._select('COUNT(*)', text, ranges)
+        return self.conn.execute(sql, params).fetchone()[0]
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,131 @@
+# ratelimit.py
+#
+# Request pacing for the crawl, used by middlewares.RateBudgetMiddleware in
+# place of a fixed DOWNLOAD_DELAY and a concurrency of 1.
+#
+# A token bucket caps the request rate at the configured budget. A 429/503
+# halves the rate and the concurrency (once per round trip, like TCP), and a
+# Retry-After header pauses every request until it has passed. Successful
+# responses win the rate back step by step, and the concurrency limit grows
+# while the average latency stays under the target, but only as far as the
+# rate budget can actually use (rate x latency requests in flight).
+import asyncio
+import email.utils
+import math
+import time
+
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait for a `Retry-After` header value (delay-seconds or HTTP date), or None."""
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode('latin-1')
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - (now if now is not None else time.time()))
+
+
+class RateBudget:
+
+    def __init__(self, rate=0.5, burst=1, max_concurrency=8, target_latency=2.0, min_rate=0.05,
+                 clock=time.monotonic):
+        self.max_rate = rate            # 0 means no rate limit, only the concurrency adapts
+        self.rate = rate
+        self.min_rate = min(min_rate, rate) if rate else 0
+        self.burst = max(1, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.target_latency = target_latency
+        self.clock = clock
+        self.concurrency = 1.0
+        self.in_flight = 0
+        self.latency = None             # moving average of the download latency
+        self.tokens = float(self.burst)
+        self.paused_until = 0.0
+        self.throttled = 0
+        self._last_refill = clock()
+        self._next_cut = 0.0
+        self._waiters = []
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def delay(self):
+        """Seconds until the next request may start as far as rate and pauses go (0 = now)."""
+        now = self.clock()
+        self._refill(now)
+        wait = self.paused_until - now
+        if self.rate and self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return max(0.0, wait)
+
+    async def acquire(self):
+        """Waits for a concurrency slot and a token; pair every call with `release()`."""
+        while True:
+            if self.in_flight >= int(self.concurrency):
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+                await waiter
+                continue
+            wait = self.delay()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            if self.rate:
+                self.tokens -= 1
+            self.in_flight += 1
+            return
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def record(self, status, latency=None, retry_after=None):
+        """Adapts rate and concurrency to the outcome of one finished request."""
+        now = self.clock()
+        if status in THROTTLE_STATUSES:
+            self.throttled += 1
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            if now >= self._next_cut:
+                # responses to requests sent before the cut must not cut again
+                self._next_cut = now + (self.latency or 1.0)
+                self._refill(now)
+                self.rate = max(self.min_rate, self.rate / 2) if self.max_rate else 0
+                self.concurrency = max(1.0, self.concurrency / 2)
+            return
+
+        if latency is not None:
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        if self.max_rate and self.rate < self.max_rate:
+            self._refill(now)
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+        if self.latency is None:
+            return
+        if self.latency <= self.target_latency:
+            ceiling = self.max_concurrency
+            if self.rate:
+                # more requests in flight than rate x latency would only wait for tokens
+                ceiling = min(ceiling, math.ceil(self.rate * self.latency) + 1)
+            if self.concurrency < ceiling:
+                self.concurrency = min(ceiling, self.concurrency + 1 / self.concurrency)
+                self._wake()
+        else:
+            self.concurrency = max(1.0, self.concurrency - 1 / self.concurrency)
@@ -0,0 +1,104 @@
+# retryqueue.py
+#
+# Persistent queue of company pages to fetch again later.
+#
+# Pages that failed (a 404, a download error once Scrapy's own retries are
+# used up, a redirect that led nowhere) or came back without a company are
+# stored with the reason and when they are due next. The delay doubles with
+# every attempt, from RETRY_QUEUE_BASE_DELAY up to RETRY_QUEUE_MAX_DELAY, so
+# a page that keeps failing costs a handful of requests instead of a hot
+# loop. The spider retries due pages once its other work is done, and pages
+# not due before the run ends stay queued for the next run. After
+# RETRY_QUEUE_MAX_ATTEMPTS failures a page goes to the dead-letter file, one
+# JSON line per page with its reason and attempts.
+import json
+import random
+import sqlite3
+import time
+
+
+class RetryQueue:
+
+    def __init__(self, path, dead_letter_path='dead_letters.jsonl', max_attempts=4, base_delay=60.0,
+                 max_delay=6 * 3600.0, jitter=0.1):
+        self.path = path
+        self.dead_letter_path = dead_letter_path
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS retries (url TEXT PRIMARY KEY, attempts INTEGER, next_at REAL,'
+            ' reason TEXT, first_failed REAL, last_failed REAL) WITHOUT ROWID'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS retries_due ON retries (next_at)')
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM retries').fetchone()[0]
+
+    def __contains__(self, url):
+        return self.conn.execute('SELECT 1 FROM retries WHERE url = ?', (url,)).fetchone() is not None
+
+    def backoff(self, attempts):
+        """Seconds to wait after the `attempts`-th failure."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def schedule(self, url, reason, now=None):
+        """Records a failed fetch of `url`.
+
+        Returns the number of failures so far, or None when that was the last
+        attempt and the page went to the dead-letter file.
+        """
+        now = now if now is not None else time.time()
+        row = self.conn.execute('SELECT attempts, first_failed FROM retries WHERE url = ?', (url,)).fetchone()
+        attempts, first_failed = (row[0] + 1, row[1]) if row else (1, now)
+        if attempts >= self.max_attempts:
+            self.conn.execute('DELETE FROM retries WHERE url = ?', (url,))
+            self.conn.commit()
+            self._dead_letter({'url': url, 'reason': reason, 'attempts': attempts,
+                               'first_failed': first_failed, 'last_failed': now})
+            return None
+        self.conn.execute(
+            'INSERT OR REPLACE INTO retries (url, attempts, next_at, reason, first_failed, last_failed)'
+            ' VALUES (?, ?, ?, ?, ?, ?)',
+            (url, attempts, now + self.backoff(attempts), reason, first_failed, now),
+        )
+        self.conn.commit()
+        return attempts
+
+    def _dead_letter(self, record):
+        with open(self.dead_letter_path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+    def remove(self, url):
+        """Forgets `url` once it was fetched successfully."""
+        self.conn.execute('DELETE FROM retries WHERE url = ?', (url,))
+        self.conn.commit()
+
+    def due(self, now=None, limit=100):
+        """`(url, attempts, reason)` of pages whose retry is due, oldest first."""
+        now = now if now is not None else time.time()
+        return self.conn.execute(
+            'SELECT url, attempts, reason FROM retries WHERE next_at <= ? ORDER BY next_at LIMIT ?', (now, limit)
+        ).fetchall()
+
+    def next_due(self):
+        """When the next retry is due (a timestamp), or None if the queue is empty."""
+        return self.conn.execute('SELECT MIN(next_at) FROM retries').fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+def open_retry_queue(settings):
+    return RetryQueue(
+        settings.get('RETRY_QUEUE_PATH', 'retry_queue.sqlite3'),
+        dead_letter_path=settings.get('RETRY_DEAD_LETTER_PATH', 'dead_letters.jsonl'),
+        max_attempts=settings.getint('RETRY_QUEUE_MAX_ATTEMPTS', 4),
+        base_delay=settings.getfloat('RETRY_QUEUE_BASE_DELAY', 60.0),
+        max_delay=settings.getfloat('RETRY_QUEUE_MAX_DELAY', 6 * 3600.0),
+    )
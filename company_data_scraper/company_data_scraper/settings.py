@@ -16,4 +16,130 @@ LOG_LEVEL = 'WARNING'  # Options: DEBUG, INFO, WARNING, ERROR, CRITICAL
 # settings.py
 ITEM_PIPELINES = {
     'company_data_scraper.pipelines.CompanyProfilePipeline': 300,
+    'company_data_scraper.pipelines.ParquetExportPipeline': 400,
 }
+
+# Profile output (see pipelines.CompanyProfilePipeline)
+# 'jsonl' streams items into append-only shards under PROFILE_OUTPUT_DIR,
+# 'json' keeps everything in memory and writes PROFILE_OUTPUT_FILE on close.
+# Run `scrapy export_json` to turn the shards into the single JSON array.
+PROFILE_OUTPUT_MODE = 'jsonl'
+PROFILE_OUTPUT_FILE = 'company_profile_data.json'
+PROFILE_OUTPUT_DIR = 'company_profile_data'
+PROFILE_SHARD_MAX_BYTES = 64 * 1024 * 1024  # rotate shards after 64 MB ...
+PROFILE_SHARD_MAX_SECONDS = 3600            # ... or after one hour
+PROFILE_OUTPUT_COMPRESSION = None           # None, 'gzip' or 'zstd' (needs `zstandard`)
+PROFILE_FLUSH_INTERVAL = 5                  # seconds between flush + fsync
+
+# Parquet dataset of the profiles (see columnar.py, needs `pyarrow`), written
+# during the crawl when PARQUET_EXPORT_ENABLED is set, or from the existing
+# output with `scrapy export_parquet`. PARQUET_PARTITION_BY is None,
+# 'industry' or 'crawl_date'. `export_parquet` replaces PARQUET_OUTPUT_DIR
+# on each run; the crawl adds one set of files per run to
+# PARQUET_CRAWL_OUTPUT_DIR.
+PARQUET_EXPORT_ENABLED = False
+PARQUET_OUTPUT_DIR = 'company_profile_parquet'
+PARQUET_CRAWL_OUTPUT_DIR = 'company_profile_parquet_crawl'
+PARQUET_PARTITION_BY = None
+PARQUET_ROW_GROUP_SIZE = 50_000
+PARQUET_COMPRESSION = 'zstd'
+
+# SQLite index of the company URLs already in the output (see index.py).
+# Built from the existing output on first use, then kept up to date by the pipeline.
+SCRAPED_INDEX_PATH = 'scraped_index.sqlite3'
+
+# Refresh crawls (`scrapy crawl company_profile_scraper -a refresh=1`) re-check
+# known companies with conditional requests, most overdue first. A page's
+# interval starts at REFRESH_INITIAL_DAYS, halves when it changed and grows
+# by half when it did not, within [REFRESH_MIN_DAYS, REFRESH_MAX_DAYS].
+REFRESH_INITIAL_DAYS = 7
+REFRESH_MIN_DAYS = 1
+REFRESH_MAX_DAYS = 60
+REFRESH_LIMIT = 0  # max pages per refresh run, 0 = all that are due
+
+# Sharded crawls (`-a work_queue=work_queue.sqlite3`, see workqueue.py): URLs
+# are leased in batches of WORK_QUEUE_BATCH, and a lease not renewed within
+# WORK_QUEUE_LEASE_SECONDS is handed to another worker.
+WORK_QUEUE_BATCH = 50
+WORK_QUEUE_LEASE_SECONDS = 600
+
+# Byte offset per input file where the profile spider resumes (see inputs.py).
+# Only moves past pages whose items are committed; saved every
+# INPUT_CURSOR_SAVE_EVERY committed pages and when the spider closes.
+INPUT_CURSOR_PATH = 'input_cursor.json'
+INPUT_CURSOR_SAVE_EVERY = 100
+
+# Request dupefilter on a memory-mapped, scalable Bloom filter (see dupefilter.py).
+# It grows past DUPEFILTER_CAPACITY as needed while keeping the false-positive
+# rate under DUPEFILTER_ERROR_RATE. Persisted under JOBDIR (or DUPEFILTER_PATH),
+# otherwise kept in memory for the run.
+DUPEFILTER_CLASS = 'company_data_scraper.dupefilter.BloomDupeFilter'
+DUPEFILTER_CAPACITY = 1_000_000
+DUPEFILTER_ERROR_RATE = 0.001
+DUPEFILTER_PATH = None
+
+# Pages that failed or had no company are retried later (see retryqueue.py):
+# the delay doubles per failure from RETRY_QUEUE_BASE_DELAY seconds up to
+# RETRY_QUEUE_MAX_DELAY, and after RETRY_QUEUE_MAX_ATTEMPTS failures the page
+# goes to RETRY_DEAD_LETTER_PATH. At the end of a run the spider waits for
+# retries due within RETRY_QUEUE_MAX_WAIT seconds; later ones wait for the next run.
+RETRY_QUEUE_PATH = 'retry_queue.sqlite3'
+RETRY_QUEUE_MAX_ATTEMPTS = 4
+RETRY_QUEUE_BASE_DELAY = 60
+RETRY_QUEUE_MAX_DELAY = 6 * 3600
+RETRY_QUEUE_MAX_WAIT = 600
+RETRY_DEAD_LETTER_PATH = 'dead_letters.jsonl'
+
+# Query index over the profile output (`scrapy profile_index update|query`, see profile_index.py)
+PROFILE_QUERY_INDEX_PATH = 'profile_index.sqlite3'
+
+# Canonical input file (see `scrapy merge_inputs`) that the directory spider
+# merges the companies it finds into. Empty to only yield the listing items.
+DIRECTORY_INPUT_PATH = 'company_slugs.csv'
+
+# Parse profile pages outside the reactor thread (see extraction_pool.py).
+# 0 parses inline, -1 uses one worker per CPU core.
+EXTRACTION_WORKERS = 0
+EXTRACTION_EXECUTOR = 'process'  # 'process' or 'thread' (lxml releases the GIL while parsing)
+EXTRACTION_MAX_IN_FLIGHT = 0     # pages queued in the pool at once, 0 = 2 x EXTRACTION_WORKERS
+
+# Raw page archive (see archive.py), read back by `scrapy reparse`.
+# Pages are stored after decompression and redirects.
+PAGE_ARCHIVE_ENABLED = False
+PAGE_ARCHIVE_DIR = 'page_archive'
+PAGE_ARCHIVE_SEGMENT_MAX_BYTES = 256 * 1024 * 1024
+PAGE_ARCHIVE_FLUSH_INTERVAL = 5
+
+# Request pacing (see ratelimit.py): a token bucket of RATE_BUDGET_RPS requests
+# per second (0 = no limit) that backs off on 429/503 and Retry-After, with
+# concurrency ramped up to CONCURRENT_REQUESTS while the average latency stays
+# under RATE_BUDGET_TARGET_LATENCY seconds.
+RATE_BUDGET_ENABLED = True
+RATE_BUDGET_RPS = 0.5
+RATE_BUDGET_BURST = 1
+RATE_BUDGET_TARGET_LATENCY = 2.0
+
+# Crawl metrics (see metrics.py): latency/parse/pipeline histograms, status,
+# redirect and retry counts, per-field fill rate and items/s. A snapshot is
+# appended to METRICS_JSONL_PATH every METRICS_EXPORT_INTERVAL seconds; set
+# METRICS_HTTP_PORT (e.g. 9410) to also serve them in the Prometheus format.
+METRICS_ENABLED = True
+METRICS_EXPORT_INTERVAL = 30
+METRICS_JSONL_PATH = 'metrics.jsonl'
+METRICS_HTTP_PORT = 0
+
+SPIDER_MIDDLEWARES = {
+    'company_data_scraper.middlewares.CompanyDataScraperSpiderMiddleware': 950,  # closest to the spider
+}
+
+DOWNLOADER_MIDDLEWARES = {
+    'company_data_scraper.middlewares.PageArchiveMiddleware': 585,  # just after HttpCompressionMiddleware
+    'company_data_scraper.middlewares.CompanyDataScraperDownloaderMiddleware': 900,  # sees raw 3xx/429 responses
+    'company_data_scraper.middlewares.RateBudgetMiddleware': 950,   # right before the download
+}
+
+EXTENSIONS = {
+    'company_data_scraper.extensions.MetricsExporter': 500,
+}
+
+COMMANDS_MODULE = 'company_data_scraper.commands'
@@ -2,53 +2,21 @@ import json
 import time
 from typing import Any, Iterable
 import scrapy
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider
 from scrapy.http import Request, Response
 import re
-from company_data_scraper.pipelines import CompanyProfilePipeline
-import csv
+from company_data_scraper.extraction import content_hash, extract_company_profile
+from company_data_scraper.extraction_pool import ExtractionPool
+from company_data_scraper.index import open_scraped_index
+from company_data_scraper.inputs import DigestSet, InputCursor, iter_input_urls
+from company_data_scraper.items import CompanyProfileItem
+from company_data_scraper.retryqueue import open_retry_queue
+from company_data_scraper.workqueue import WorkQueue, default_owner
 
+# Inputs are streamed row by row; pass `-a input_file=a.csv,b.json` to change them
 #input_file = 'company_names.json'
 input_file = 'company_ids.csv'
-company_urls = []
-
-def get_url_by_company_name():
-    global company_urls
-    try:
-        with open(input_file, 'r') as json_file:
-            data = json.load(json_file)
-            for v in data.values():
-                if isinstance(v,str) and len(v)>=1 and v[-1]=='/':
-                    v=v[:-1]
-                company_urls.append(v + "/?trk=companies_directory")
-            print("Company URLs:", len(company_urls))
-    except FileNotFoundError:
-        print(f"Error: JSON file '{input_file}' not found.")
-    except Exception as e:
-        print(f"An error occurred while reading JSON file: {str(e)}")
-
-def get_url_by_company_id():
-    global company_urls
-    existing_data=[]
-    try:
-        output_file = 'company_profile_data.json'
-        with open(output_file, 'r') as f:
-            existing_data = json.load(f)
-            existing_data = [item['company_url'] for item in existing_data]
-            print("Found ", len(existing_data), " existing company URLs")
-    except:
-        print("No existing data found")
-    try:
-        with open(input_file, 'r') as csv_file:
-            reader = csv.reader(csv_file)   
-            for row in reader:
-                url="https://www.linkedin.com/company/" + row[0] + "/?trk=companies_directory"
-                if url not in existing_data:
-                    company_urls.append(url)
-            print(f" >  Loaded {len(company_urls)} Company URLs")
-    except FileNotFoundError:
-        print(f"/!\ Error: CSV file '{input_file}' not found.")
-    except Exception as e:
-        print(f"/!\ Error: An error occurred while reading CSV file: {str(e)}")
 
 
 class CompanyProfileScraperSpider(scrapy.Spider):
@@ -58,160 +26,310 @@ class CompanyProfileScraperSpider(scrapy.Spider):
         'HTTPERROR_ALLOW_ALL': True,
         'REDIRECT_ENABLED': True,
         'REDIRECT_MAX_TIMES': 5,
-        'DOWNLOAD_DELAY': 2,              # Increased download delay to 3 seconds
-        'RANDOMIZE_DOWNLOAD_DELAY': True, # Randomize download delay for natural behavior
+        'DOWNLOAD_DELAY': 0,              # Pacing is done by RateBudgetMiddleware (RATE_BUDGET_* settings)
         'RETRY_TIMES': 5,
-        'DUPEFILTER_CLASS': 'scrapy.dupefilters.RFPDupeFilter',
-        'CONCURRENT_REQUESTS': 1,
-        'CONCURRENT_REQUESTS_PER_DOMAIN': 1,
-        'CONCURRENT_REQUESTS_PER_IP': 1,
+        'CONCURRENT_REQUESTS': 8,         # Upper bound, the rate budget ramps concurrency up to it
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 8,
+        'CONCURRENT_REQUESTS_PER_IP': 8,
     }
 
-    def __init__(self, *args, **kwargs):
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        # Company URLs already in the output, kept up to date by CompanyProfilePipeline
+        kwargs['scraped_index'] = open_scraped_index(crawler.settings)
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        # The cursor and work queue only move past pages once the pipeline committed them
+        spider.scraped_index.commit_listeners.append(spider.committed)
+        spider.input_cursor = InputCursor(crawler.settings.get('INPUT_CURSOR_PATH', 'input_cursor.json'))
+        spider.cursor_save_every = crawler.settings.getint('INPUT_CURSOR_SAVE_EVERY', 100)
+        spider.refresh_limit = crawler.settings.getint('REFRESH_LIMIT', 0)
+        # Failed pages are retried with a backoff at the end of the run, or in a later one
+        spider.retry_queue = open_retry_queue(crawler.settings)
+        spider.retry_max_wait = crawler.settings.getfloat('RETRY_QUEUE_MAX_WAIT', 600)
+        crawler.signals.connect(spider.spider_idle, signal=signals.spider_idle)
+        if spider.work_queue_path:
+            # Sharded crawl: URLs are leased from a queue shared with the other workers
+            spider.work_queue = WorkQueue(spider.work_queue_path)
+            spider.queue_owner = default_owner()
+            spider.queue_batch = crawler.settings.getint('WORK_QUEUE_BATCH', 50)
+            spider.lease_seconds = crawler.settings.getfloat('WORK_QUEUE_LEASE_SECONDS', 600)
+        # Optional worker pool so page parsing does not block the reactor
+        spider.extraction_pool = ExtractionPool.from_settings(crawler.settings)
+        if spider.reset_cursor:
+            spider.input_cursor.reset()
+        return spider
+
+    def __init__(self, *args, scraped_index=None, input_file=input_file, reset_cursor=False, refresh=False,
+                 work_queue=None, shards=None, **kwargs):
         super().__init__(*args, **kwargs)
-        #get_url_by_company_name()
-        get_url_by_company_id()
-        print(f" >  Found {len(company_urls)} URLs to scrape. Have to check if they are already scraped")
+        self.scraped_index = scraped_index
+        self.input_files = [path.strip() for path in input_file.split(',') if path.strip()]
+        self.reset_cursor = reset_cursor not in (False, '0', 'false', 'False', '')
+        # `-a refresh=1` re-checks already scraped companies that are due instead of reading the inputs
+        self.refresh = refresh not in (False, '0', 'false', 'False', '')
+        # `-a work_queue=queue.sqlite3 [-a shards=0,1]` takes URLs from a shared work queue instead
+        self.work_queue_path = work_queue
+        self.shards = [int(shard) for shard in shards.split(',')] if shards else None
+        self.work_queue = None
+        self.queue_done = []
+        # Requests handed to Scrapy but not finished yet: url -> (input file, byte offset, row)
+        self.pending = {}
+        # Finished requests whose item or page state is not committed yet, same values
+        self.finished = {}
+        # Every URL requested in this run. Page requests are deduplicated here and sent with
+        # dont_filter: a dupefilter persisted across runs (DUPEFILTER_PATH, JOBDIR) would drop
+        # refreshes and the uncommitted pages a rerun sends again, leaving them pending for good
+        self.requested = DigestSet()
+        self.pages_since_save = 0
+        # Where each input file continues once its pending rows are done: input file -> (byte offset, row)
+        self.input_positions = {}
+        self.pages_queued = 0
+        self.pages_done = 0
+        self.pages_unchanged = 0
+        self.pages_failed = 0
+
+    def closed(self, reason):
+        if self.work_queue is not None:
+            self.work_queue.complete(self.queue_done)
+            self.work_queue.release(self.queue_owner)
+            self.work_queue.close()
+        self.save_cursor()
+        if self.refresh:
+            print(f" >  Refreshed {self.pages_done} of {self.pages_queued} due URLs, {self.pages_unchanged} unchanged.")
+        else:
+            print(f" >  Queued {self.pages_queued} new URLs, finished {self.pages_done}.")
+        if self.pages_failed:
+            print(f" >  {self.pages_failed} fetches failed, {len(self.retry_queue)} pages are left in "
+                  f"{self.retry_queue.path} for a later run.")
+        self.retry_queue.close()
+        self.scraped_index.close()
+        if self.extraction_pool is not None:
+            self.extraction_pool.close()
+
+    def save_cursor(self):
+        # Resume at the oldest row not committed yet, so nothing handed out is lost on a crash
+        uncommitted = list(self.pending.values()) + list(self.finished.values())
+        for path, position in self.input_positions.items():
+            in_flight = [(offset, row) for source, offset, row in uncommitted if source == path]
+            offset, row = min(in_flight) if in_flight else position
+            self.input_cursor.set(path, offset, row)
+        self.input_cursor.save()
+
+    def mark_done(self, company_url):
+        position = self.pending.pop(company_url, None)
+        if position is None:
+            return
+        self.pages_done += 1
+        self.finished[company_url] = position
 
-        self.company_pages = [url for url in set(company_urls) if url not in CompanyProfilePipeline.scraped_urls]
-        print(f" >  Found {len(self.company_pages)} new URLs to scrape.")
-        
-        if not company_urls:
-            print(" >  No company URLs found. Exiting spider.")
-            raise ValueError(" >  No URLs to scrape.")
+    def committed(self):
+        # Everything finished so far is on disk now (the items written before the commit,
+        # the page states in the index, the failures in the retry queue)
+        if not self.finished:
+            return
+        self.pages_since_save += len(self.finished)
+        if self.work_queue is not None:
+            self.queue_done.extend(self.finished)
+            if len(self.queue_done) >= self.queue_batch:
+                self.work_queue.complete(self.queue_done)
+                self.queue_done = []
+        self.finished = {}
+        if self.pages_since_save >= self.cursor_save_every:
+            self.pages_since_save = 0
+            self.save_cursor()
 
     def start_requests(self):
-        for idx, url in enumerate(self.company_pages):
-            yield scrapy.Request(
+        if self.refresh:
+            yield from self.refresh_requests()
+            return
+        if self.work_queue is not None:
+            while True:
+                requests = self.queue_requests()
+                if not requests:
+                    break
+                yield from requests
+            return
+        for path in self.input_files:
+            offset, row = self.input_cursor.get(path)
+            if offset:
+                print(f" >  Resuming {path} at row {row} (byte {offset})")
+            try:
+                for url, start, end in iter_input_urls(path, offset):
+                    self.input_positions[path] = (end, row + 1)
+                    if url not in self.scraped_index and self.requested.add(url):
+                        self.pending[url] = (path, start, row)
+                        self.pages_queued += 1
+                        yield scrapy.Request(
+                            url=url,
+                            callback=self.parse_response,
+                            errback=self.handle_error,
+                            meta={'company_url': url},
+                            dont_filter=True
+                        )
+                    row += 1
+            except FileNotFoundError:
+                print(f"/!\\ Error: input file '{path}' not found.")
+        if not self.pages_queued:
+            print(" >  No new company URLs to scrape.")
+
+    def queue_requests(self):
+        # Keep our in-flight leases alive, then lease the next batch
+        self.work_queue.complete(self.queue_done)
+        self.queue_done = []
+        self.work_queue.renew(self.queue_owner, self.lease_seconds)
+        requests = []
+        while not requests:
+            urls = self.work_queue.claim(self.queue_owner, self.queue_batch, self.lease_seconds, self.shards)
+            if not urls:
+                break
+            for url in urls:
+                if url in self.scraped_index:
+                    self.queue_done.append(url)
+                    continue
+                if not self.requested.add(url):
+                    continue  # still ours from an expired lease; completed with the first request
+                self.pending[url] = (None, 0, 0)
+                self.pages_queued += 1
+                requests.append(scrapy.Request(
+                    url=url,
+                    callback=self.parse_response,
+                    errback=self.handle_error,
+                    meta={'company_url': url},
+                    dont_filter=True
+                ))
+        return requests
+
+    def retry_requests(self):
+        # Failed pages whose backoff has passed, oldest first
+        requests = []
+        for url, attempts, reason in self.retry_queue.due():
+            if url in self.pending:
+                continue
+            if not self.refresh and url in self.scraped_index:
+                # written since it failed, e.g. from another input file
+                self.retry_queue.remove(url)
+                continue
+            print(f"Retrying {url} (failed {attempts}x, last: {reason})")
+            self.requested.add(url)
+            self.pending[url] = (None, 0, 0)
+            self.pages_queued += 1
+            requests.append(scrapy.Request(
                 url=url,
                 callback=self.parse_response,
-                meta={'company_index_tracker': idx, 'company_url': url, 'retry_count': 0}
-            )
+                errback=self.handle_error,
+                meta={'company_url': url, 'retry_attempt': attempts},
+                dont_filter=True
+            ))
+        return requests
+
+    def retry_later(self, company_url, reason):
+        self.pages_failed += 1
+        attempts = self.retry_queue.schedule(company_url, reason)
+        if attempts is None:
+            print(f"/!\\ Giving up on {company_url} ({reason}), see {self.retry_queue.dead_letter_path}")
+        else:
+            print(f"Will retry {company_url} later ({reason}, failure {attempts})")
+        self.mark_done(company_url)
 
-    def parse_response(self, response):
-        company_index_tracker = response.meta['company_index_tracker']
-        company_url = self.company_pages[company_index_tracker]
-        retry_count = response.meta.get('retry_count', 0)
+    def spider_idle(self, spider):
+        # Retry-later pass, then the next leases of a sharded crawl
+        requests = self.retry_requests()
+        if self.work_queue is not None:
+            requests += self.queue_requests()
+            self.work_queue.complete(self.queue_done)
+            self.queue_done = []
+        for request in requests:
+            self.crawler.engine.crawl(request)
+        if requests:
+            raise DontCloseSpider
+        # Other workers may still hold leases that expire; wait for them until the queue is drained
+        # (our own finished leases are completed once the pipeline commits them at close)
+        if self.work_queue is not None and not self.work_queue.is_drained(self.queue_owner):
+            raise DontCloseSpider
+        # Wait for retries that are due soon; later ones are left for the next run
+        next_due = self.retry_queue.next_due()
+        if next_due is not None and next_due - time.time() <= self.retry_max_wait:
+            raise DontCloseSpider
 
-        # Handle redirects
-        if response.status in [301, 302, 303, 307, 308]:
-            print(f"Redirect encountered for {response.url}. Handling redirect.")
+    def refresh_requests(self):
+        # Conditional requests for known companies, most overdue first
+        for url, state in self.scraped_index.iter_due(limit=self.refresh_limit):
+            headers = {}
+            if state is not None and state['etag']:
+                headers['If-None-Match'] = state['etag']
+            if state is not None and state['last_modified']:
+                headers['If-Modified-Since'] = state['last_modified']
+            self.requested.add(url)
+            self.pending[url] = (None, 0, 0)
+            self.pages_queued += 1
             yield scrapy.Request(
-                url=response.headers['Location'].decode('utf-8'), 
+                url=url,
                 callback=self.parse_response,
-                meta={'company_index_tracker': company_index_tracker, 'retry_count': retry_count, 'cookiejar': retry_count},
+                errback=self.handle_error,
+                headers=headers,
+                meta={'company_url': url, 'page_state': state},
                 dont_filter=True
             )
+        if not self.pages_queued:
+            print(" >  No company pages due for a refresh.")
+
+    def handle_error(self, failure):
+        # Scrapy's own retries (RETRY_TIMES) are used up by now
+        company_url = failure.request.meta['company_url']
+        print(f"Request failed for {company_url}: {failure.value!r}")
+        self.retry_later(company_url, f'{failure.type.__name__}: {failure.value}')
+
+    async def parse_response(self, response):
+        company_url = response.meta['company_url']
+
+        # Redirects are followed by RedirectMiddleware and transient errors retried by RetryMiddleware;
+        # whatever still is not a page (404, redirect loop, 429 after all retries) is retried later
+        if response.status not in (200, 304):
+            self.retry_later(company_url, f'HTTP {response.status}')
             return
 
-        # Retry on 404 errors
-        if response.status == 404:
-            if retry_count < 2:
-                print(f"Page not found for {company_url}. Retrying ({retry_count + 1}/3)...")
-                yield scrapy.Request(
-                    url=company_url,
-                    callback=self.parse_response,
-                    meta={'company_index_tracker': company_index_tracker, 'retry_count': retry_count + 1},
-                    dont_filter=True
-                )
-            else:
-                print(f"Max retries reached for {company_url}. Skipping.")
+        # Skip extraction and output when the page did not change since the last fetch
+        previous = response.meta.get('page_state')
+        validators = {
+            'etag': response.headers.get('ETag', b'').decode('latin-1') or (previous or {}).get('etag'),
+            'last_modified': response.headers.get('Last-Modified', b'').decode('latin-1') or (previous or {}).get('last_modified'),
+        }
+        digest = content_hash(response.body) if response.status != 304 else None
+        if response.status == 304 or (previous is not None and digest == previous['content_hash']):
+            print(f"Unchanged since the last crawl: {company_url}")
+            self.scraped_index.record_page(company_url, content_hash=digest, changed=False, **validators)
+            self.pages_unchanged += 1
+            self.retried(response)
+            self.mark_done(company_url)
             return
 
         print('********')
-        print(f'Scraping page: {str(company_index_tracker + 1)} of {str(len(self.company_pages))} - URL QUERIED: {company_url} -  CURRENT URL: {response.url}')
+        print(f'Scraping page: {str(self.pages_done + 1)} of {str(self.pages_queued)} queued - URL QUERIED: {company_url} -  CURRENT URL: {response.url}')
         print('********')
 
-        company_item = {}
-        company_item['company_url'] = company_url
+        encoding = getattr(response, 'encoding', None)
+        content_type = response.headers.get('Content-Type', b'').decode('latin-1')
+        if self.extraction_pool is not None:
+            company_item = await self.extraction_pool.extract(response.body, company_url, encoding, content_type)
+        else:
+            company_item = extract_company_profile(response.body, company_url, encoding, content_type)
 
-        company_item['company_name'] = response.css('.top-card-layout__entity-info h1::text').get(default='not-found').strip()
-
-        # Pause for an additional 3 seconds if company_name is 'not-found'
-        if company_item['company_name'] == 'not-found':
-            print("Company name not found. Skipping it for now - ", company_url)
+        # No company name: a login wall or an incomplete page rather than a profile
+        if company_item is None:
+            print("Company name not found, will retry later - ", company_url)
+            self.retry_later(company_url, 'company name not found')
             return
 
-        followers_count_text = response.xpath('//h3[contains(@class, "top-card-layout__first-subline")]/span/following-sibling::text()').get(default='not-found')
-        try:
-            company_item['linkedin_followers_count'] = int(followers_count_text.split()[0].strip().replace(',', '')) if followers_count_text != 'not-found' else None
-        except (ValueError, AttributeError):
-            company_item['linkedin_followers_count'] = None
-
-        company_item['company_logo_url'] = response.css('div.top-card-layout__entity-image-container img::attr(data-delayed-url)').get(default='not-found')
-        company_item['about_us'] = response.css('.core-section-container__content p::text').get(default='not-found').strip()
-
-        try:
-            #followers_num_match = re.findall(r'\d{1,3}(?:,\d{3})*', response.css('a.face-pile__cta::text').get(default='not-found').strip())
-            followers_text=response.css('p.face-pile__text::text').get(default='not-found').strip() # 'View all 62 employees'
-            followers_num_match = re.findall(r'\d{1,3}(?:,\d{3})*', followers_text)
-            company_item['num_of_employees'] = int(followers_num_match[0].replace(',', '')) if followers_num_match else None
-        except Exception as e:
-            print("Error occurred while getting number of employees:", e)
-
-        # Extract additional company details safely
-        try:
-            company_details = response.css('.core-section-container__content .mb-2')
-            try:
-                company_item['website'] = company_details[0].css('a::text').get(default='not-found').strip()
-            except:
-                company_item['website'] = ""
-
-            company_item['industry'] = ""
-            company_item['company_size_approx'] = ""
-            company_item['headquarters'] = ""
-            company_item['type'] = ""
-            company_item['founded'] = ""
-
-            for i in range(len(company_details)):
-                try:
-                    company_detail_item=company_details[i].css('.text-md::text').getall()
-                    if company_detail_item[0].lower().strip() == 'industry':
-                        company_item['industry'] = company_detail_item[1].strip()
-                    elif company_detail_item[0].lower().strip() == 'company size':
-                        company_item['company_size_approx'] = company_detail_item[1].strip().split()[0]
-                    elif company_detail_item[0].lower().strip() == 'headquarters':
-                        company_item['headquarters'] = company_detail_item[1].strip()
-                    elif company_detail_item[0].lower().strip() == 'type':
-                        company_item['type'] = company_detail_item[1].strip()
-                    elif company_detail_item[0].lower().strip() == 'founded':
-                        company_item['founded'] = company_detail_item[1].strip()
-                except:
-                    pass
-            try:
-                # specialities or founded, one among them -> storing in unsure_parameter
-                unsure_parameter = company_details[5].css('.text-md::text').getall()
-                unsure_parameter_key = unsure_parameter[0].lower().strip()
-                company_item[unsure_parameter_key] = unsure_parameter[1].strip()
-                # founded comes before specialties if exists, or else specialties at first means that founded parameter isn't defined
-                if unsure_parameter_key == 'founded':
-                    company_specialties = company_details[6].css('.text-md::text').getall()
-                    # after founded is extracted, check if specialties is defined
-                    if company_specialties[0].lower().strip() == 'specialties':
-                        company_item['specialties'] = company_specialties[1].strip()
-                    else:
-                        company_item['specialties'] = 'not-found'
-                elif unsure_parameter_key != 'specialties' or unsure_parameter_key == 'founded':
-                    company_item['founded'] = 'not-found'
-                    company_item['specialties'] = 'not-found'
-            except:
-                company_item['founded'] = ""
-                company_item['specialties'] = ""
-
-        except IndexError:
-            print("Error: *****Skipped index, as some details are missing*********")
-
-        yield company_item
-        company_index_tracker += 1
-
-        # Request next URL
-        if company_index_tracker + 1 < len(self.company_pages):
-            next_url = self.company_pages[company_index_tracker + 1]
-            yield scrapy.Request(
-                url=next_url,
-                callback=self.parse_response,
-                meta={'company_index_tracker': company_index_tracker + 1}
-            )
+        # Page state is written together with the item (see ScrapedUrlIndex.add)
+        self.scraped_index.stage_page(company_url, content_hash=digest, **validators)
+        yield CompanyProfileItem.from_profile(company_item)
+        self.retried(response)
+        self.mark_done(company_url)
+
+    def retried(self, response):
+        # A retry that worked leaves the retry queue
+        if response.meta.get('retry_attempt'):
+            self.retry_queue.remove(response.meta['company_url'])
 
 
 # scrapy  crawl company_profile_scraper
\ No newline at end of file
@@ -1,75 +1,85 @@
+# linkedin_directory_scraper.py
+#
+# Walks the LinkedIn company directory and yields one CompanyListingItem per
+# company, the first time its slug is seen. All letter sections are requested
+# up front and every sub-page is followed as soon as it is found, so the
+# sections are crawled concurrently (paced by RateBudgetMiddleware). The slugs
+# are also merged into the profile spider's input file by
+# DirectoryInputPipeline (DIRECTORY_INPUT_PATH).
+from urllib.parse import urlsplit
+
 import scrapy
 
+from company_data_scraper.inputs import PROFILE_URL_TEMPLATE, DigestSet, canonical_slug
+from company_data_scraper.items import CompanyListingItem
 
-class LinkedinDirectoryScraperSpider(scrapy.Spider):
-    name = "linkedin_directory_scraper"
+DIRECTORY_URL = "https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies"
+SECTIONS = list('abcdefghijklmnopqrstuvwxyz') + ['more']
 
-    start_urls = [
-        "https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies"]
 
-    letter_nav_links = ['https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/a?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/b?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/c?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/d?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/e?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/f?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/g?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/h?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/i?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/j?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/k?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/l?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/m?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/n?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/o?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/p?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/q?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/r?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/s?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/t?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/u?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/v?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/w?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/x?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/y?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/z?trk=companies_directory_letter_nav',
-                        'https://webcache.googleusercontent.com/search?q=cache:https://www.linkedin.com/directory/companies/more?trk=companies_directory_letter_nav']
+class LinkedinDirectoryScraperSpider(scrapy.Spider):
+    name = "linkedin_directory_scraper"
 
-    company_listings = {}
+    custom_settings = {
+        'DOWNLOAD_DELAY': 0,              # Pacing is done by RateBudgetMiddleware (RATE_BUDGET_* settings)
+        'CONCURRENT_REQUESTS': 8,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 8,
+        'CONCURRENT_REQUESTS_PER_IP': 8,
+        'ITEM_PIPELINES': {
+            'company_data_scraper.pipelines.DirectoryInputPipeline': 300,
+        },
+    }
+
+    def __init__(self, *args, directory_url=DIRECTORY_URL, **kwargs):
+        super().__init__(*args, **kwargs)
+        # `-a directory_url=...` fetches the directory from elsewhere (e.g. a mirror or the benchmark stand-in)
+        self.directory_url = directory_url.rstrip('/')
+        self.letter_nav_links = [f'{self.directory_url}/{section}?trk=companies_directory_letter_nav'
+                                 for section in SECTIONS]
+        self.seen_slugs = DigestSet()
+        self.pages_parsed = 0
+        self.duplicates = 0
+
+    def start_requests(self):
+        yield scrapy.Request(url=self.directory_url, callback=self.parse)
+        for url in self.letter_nav_links:
+            yield scrapy.Request(url=url, callback=self.parse)
 
     def parse(self, response):
-        featured_company_listings = response.css(".listings__entry-link")
-
-        for i in range(0, len(featured_company_listings) - 1):
-            self.company_listings[featured_company_listings[i].css(
-                "::text").get()] = featured_company_listings[i].css("::attr(href)").get()
-
-        letter_nav_tracker = 0
-        first_url = self.letter_nav_links[letter_nav_tracker]
-
-        yield scrapy.Request(url=first_url, callback=self.parse_response, meta={'letter_nav_tracker': letter_nav_tracker})
-
-    def parse_response(self, response):
-        letter_nav_tracker = response.meta['letter_nav_tracker']
-
-        print('****')
-        print(
-            f'Scraping SECTION: {self.letter_nav_links[letter_nav_tracker].split("/")[-1].strip("?")[0].upper()}')
-        print('****')
-
-        company_listings = response.css(".listings__entry-link")
-
-        for i in range(0, len(company_listings) - 1):
-            self.company_listings[company_listings[i].css(
-                "::text").get()] = company_listings[i].css("::attr(href)").get()
-
-        print("Parsing Page and getting Company Listings..")
-
-        yield self.company_listings
-
-        letter_nav_tracker += 1
-
-        if letter_nav_tracker <= (len(self.letter_nav_links) - 1):
-            letter_nav_tracker += 1
-            next_section_url = self.letter_nav_links[letter_nav_tracker]
-            yield scrapy.Request(url=next_section_url, callback=self.parse_response, meta={'letter_nav_tracker': letter_nav_tracker})
+        self.pages_parsed += 1
+        for link in response.css(".listings__entry-link, .pagination-links"):
+            href = link.attrib.get('href')
+            if not href:
+                continue
+            slug = canonical_slug(href)
+            if slug is not None:
+                if self.seen_slugs.add(slug):
+                    name = link.css("::text").get()
+                    yield CompanyListingItem(
+                        company_name=name.strip() if name else None,
+                        company_slug=slug,
+                        company_url=PROFILE_URL_TEMPLATE.format(slug),
+                    )
+                else:
+                    self.duplicates += 1
+                continue
+            page_url = self.directory_page_url(href)
+            if page_url:
+                # sub-pages of a section; the dupefilter drops the ones already requested
+                yield scrapy.Request(url=page_url, callback=self.parse)
+
+    def directory_page_url(self, href):
+        """The URL to fetch for a directory link found on a page, or None for other links."""
+        path = urlsplit(href).path
+        marker = '/directory/companies'
+        if marker not in path:
+            return None
+        rest = path[path.index(marker) + len(marker):].strip('/')
+        if not rest:
+            return None
+        query = urlsplit(href).query
+        return f'{self.directory_url}/{rest}' + (f'?{query}' if query else '')
+
+    def closed(self, reason):
+        print(f" >  Found {len(self.seen_slugs)} companies on {self.pages_parsed} directory pages"
+              f" ({self.duplicates} repeated listings skipped).")
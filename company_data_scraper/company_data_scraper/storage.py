@@ -0,0 +1,260 @@
+# storage.py
+#
+# Append-only JSONL shard output for the company profile pipeline.
+#
+# Each run writes its items to one or more shards in an output directory
+# (`profiles-<timestamp>-<seq>.jsonl[.gz|.zst]`). Shards are rotated by size
+# and age, and are flushed + fsynced on a fixed interval so a crash loses at
+# most one interval of items. Readers tolerate a truncated last line/frame.
+import gzip
+import json
+import os
+import textwrap
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, only needed for 'zstd' shards
+    zstandard = None
+
+SHARD_PREFIX = 'profiles'
+COMPRESSION_SUFFIXES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+
+def _shard_suffix(compression):
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unsupported compression: {compression!r} (use None, 'gzip' or 'zstd')")
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError("zstd compression requires the 'zstandard' package")
+    return '.jsonl' + COMPRESSION_SUFFIXES[compression]
+
+
+class JsonlShardWriter:
+    """Writes dicts as JSON lines into rotating, optionally compressed shards."""
+
+    def __init__(self, directory, prefix=SHARD_PREFIX, max_bytes=64 * 1024 * 1024,
+                 max_seconds=3600, compression=None, flush_interval=5.0):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.compression = compression
+        self.flush_interval = flush_interval
+        self.suffix = _shard_suffix(compression)
+        self.run_id = time.strftime('%Y%m%dT%H%M%S')
+        self.shard_seq = 0
+        self._raw = None
+        self._stream = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _open_shard(self):
+        path = os.path.join(self.directory, f'{self.prefix}-{self.run_id}-{self.shard_seq:05d}{self.suffix}')
+        self.shard_seq += 1
+        # 'xb' so an existing shard is never appended to or overwritten
+        self._raw = open(path, 'xb')
+        if self.compression == 'gzip':
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode='wb')
+        elif self.compression == 'zstd':
+            self._stream = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = self._raw
+        self._shard_bytes = 0
+        self._shard_opened = time.monotonic()
+        self._last_flush = self._shard_opened
+
+    def _close_shard(self):
+        if self._raw is None:
+            return
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+        self._raw = self._stream = None
+
+    def write(self, record):
+        """Appends `record`. Returns True when this call also flushed the shard to disk."""
+        data = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        now = time.monotonic()
+        if self._raw is not None and (self._shard_bytes >= self.max_bytes
+                                      or now - self._shard_opened >= self.max_seconds):
+            self._close_shard()
+        if self._raw is None:
+            self._open_shard()
+        self._stream.write(data)
+        self._shard_bytes += len(data)
+        if now - self._last_flush >= self.flush_interval:
+            self.flush()
+            return True
+        return False
+
+    def flush(self):
+        """Pushes buffered items to disk. Everything written before this call survives a crash."""
+        if self._raw is None:
+            return
+        if self.compression == 'zstd':
+            # ending the frame makes everything so far decodable on its own
+            self._stream.flush(zstandard.FLUSH_FRAME)
+        else:
+            # GzipFile.flush() does a Z_SYNC_FLUSH
+            self._stream.flush()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self._close_shard()
+
+
+def list_shards(directory, prefix=SHARD_PREFIX):
+    """Shard paths in write order (the names sort chronologically)."""
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(n for n in os.listdir(directory)
+                   if n.startswith(prefix + '-') and '.jsonl' in n)
+    return [os.path.join(directory, n) for n in names]
+
+
+def _decompressor(path):
+    if path.endswith('.gz'):
+        return lambda: zlib.decompressobj(wbits=31), zlib.error
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ValueError(f"Cannot read '{path}': the 'zstandard' package is not installed")
+        return zstandard.ZstdDecompressor().decompressobj, zstandard.ZstdError
+    return None, None
+
+
+def _iter_shard_chunks(path, size=1024 * 1024):
+    """Decoded bytes of a shard, up to where a truncated or damaged stream stops.
+
+    Decoding is incremental, so everything before the truncation point (all
+    the flushed items of a shard whose writer never closed it) comes out.
+    Each gzip member or zstd frame gets its own decompressor.
+    """
+    new_decompressor, error = _decompressor(path)
+    with open(path, 'rb') as f:
+        if new_decompressor is None:
+            while chunk := f.read(size):
+                yield chunk
+            return
+        decompressor = new_decompressor()
+        while data := f.read(size):
+            while data:
+                try:
+                    yield decompressor.decompress(data)
+                except error:
+                    return  # damaged data: keep what was decoded before it
+                if not decompressor.eof:
+                    break
+                data = decompressor.unused_data
+                decompressor = new_decompressor()
+
+
+def iter_shard_records(path):
+    """Yields the records of one shard, stopping quietly at a truncated tail."""
+    pending = b''
+    for chunk in _iter_shard_chunks(path):
+        if chunk:
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+    # a last line without newline is a partial write from a crash
+    if pending.strip():
+        try:
+            yield json.loads(pending)
+        except json.JSONDecodeError:
+            pass
+
+
+def iter_records(directory, prefix=SHARD_PREFIX):
+    for path in list_shards(directory, prefix):
+        yield from iter_shard_records(path)
+
+
+def iter_legacy_records(output_file):
+    """Records of a legacy single-array JSON output, or nothing if it is missing/corrupt."""
+    if not os.path.exists(output_file):
+        return
+    with open(output_file, 'r') as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError:
+            return
+    yield from data
+
+
+def iter_output_records(output_file, output_dir):
+    """All profile records: the legacy JSON array first, then the JSONL shards."""
+    yield from iter_legacy_records(output_file)
+    yield from iter_records(output_dir)
+
+
+def _latest_positions(records):
+    """company_url -> position of its last record, for last-one-wins deduplication."""
+    latest = {}
+    for position, record in enumerate(records):
+        url = record.get('company_url')
+        if url is not None:
+            latest[url] = position
+    return latest
+
+
+def iter_latest_records(records_factory):
+    """Streams the records of `records_factory()`, keeping only the last one per company_url.
+
+    The records are read twice, so memory only holds one position per URL.
+    Records without a company_url are all kept.
+    """
+    latest = _latest_positions(records_factory())
+    for position, record in enumerate(records_factory()):
+        url = record.get('company_url')
+        if url is None or latest.get(url, position) == position:
+            yield record
+
+
+def convert_to_json_array(output_file, output_dir, destination=None):
+    """Writes every record (deduplicated by company_url) as one indented JSON array.
+
+    The layout matches what `json.dump(data, f, indent=4)` used to produce, but
+    records are streamed. Refresh crawls append new versions of a company, so
+    the last record of a company_url is the one kept.
+    Returns the number of records written.
+    """
+    destination = destination or output_file
+    tmp_path = destination + '.tmp'
+    count = 0
+    with open(tmp_path, 'w') as out:
+        out.write('[')
+        for record in iter_latest_records(lambda: iter_output_records(output_file, output_dir)):
+            out.write(',\n' if count else '\n')
+            out.write(textwrap.indent(json.dumps(record, indent=4), '    '))
+            count += 1
+        out.write('\n]' if count else ']')
+    os.replace(tmp_path, destination)
+    return count
+
+
+def merge_outputs(sources, destination, compression=None):
+    """Merges the JSONL shards of several output directories into new shards under `destination`.
+
+    Used to combine the outputs of the workers of a sharded crawl; records are
+    deduplicated by company_url (the last source listed wins). Returns the
+    number of records written.
+    """
+    def records():
+        for source in sources:
+            yield from iter_records(source)
+
+    writer = JsonlShardWriter(destination, compression=compression)
+    count = 0
+    try:
+        for record in iter_latest_records(records):
+            writer.write(record)
+            count += 1
+    finally:
+        writer.close()
+    return count
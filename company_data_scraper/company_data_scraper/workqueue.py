@@ -0,0 +1,148 @@
+# workqueue.py
+#
+# Shared work queue for crawling one input set with several workers.
+#
+# Every input URL is assigned to one of N shards by a stable hash of its
+# company slug, and stored once in an SQLite queue file that all workers
+# open (on one box, or on a shared volume). A worker claims a batch of URLs
+# with a time-limited lease, renews its leases while it works and marks them
+# done when they are finished. Leases of a worker that died expire and are
+# claimed again by the others, and a URL that is done is never handed out
+# again, so nothing is fetched twice while leases are live.
+import contextlib
+import hashlib
+import os
+import socket
+import sqlite3
+import time
+
+from company_data_scraper.inputs import canonical_slug, iter_input_urls
+
+QUEUED, LEASED, DONE = 0, 1, 2
+
+
+def shard_of(url, shards):
+    """Stable shard number of `url` in `[0, shards)`, the same on every machine."""
+    digest = hashlib.blake2b((canonical_slug(url) or url).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % shards
+
+
+def default_owner():
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+class WorkQueue:
+
+    def __init__(self, path, timeout=60):
+        self.path = path
+        # autocommit, so claims can take the write lock up front with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS work (id INTEGER PRIMARY KEY, url TEXT UNIQUE, shard INTEGER,'
+            ' state INTEGER DEFAULT 0, owner TEXT, lease_expires REAL, attempts INTEGER DEFAULT 0)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS work_state ON work (state, lease_expires)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+
+    @property
+    def shards(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'shards'").fetchone()
+        return int(row[0]) if row else None
+
+    def populate(self, input_files, shards, batch_size=10000):
+        """Adds every URL of `input_files` (URLs already queued are kept as they are)."""
+        if self.shards not in (None, shards):
+            raise ValueError(f"'{self.path}' was built with {self.shards} shards, not {shards}")
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('shards', ?)", (str(shards),))
+        added = 0
+        for path in input_files:
+            batch = []
+            for url, _start, _end in iter_input_urls(path):
+                batch.append((url, shard_of(url, shards)))
+                if len(batch) >= batch_size:
+                    added += self._insert(batch)
+                    batch = []
+            added += self._insert(batch)
+        return added
+
+    def _insert(self, batch):
+        if not batch:
+            return 0
+        with self._write():
+            before = self.conn.total_changes
+            self.conn.executemany('INSERT OR IGNORE INTO work (url, shard) VALUES (?, ?)', batch)
+            return self.conn.total_changes - before
+
+    @contextlib.contextmanager
+    def _write(self):
+        # take the write lock before reading, so two workers never claim the same rows
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+
+    def claim(self, owner, count, lease_seconds, shards=None):
+        """Leases up to `count` queued (or expired) URLs to `owner` and returns them."""
+        now = time.time()
+        query = 'SELECT id, url FROM work WHERE (state = ? OR (state = ? AND lease_expires < ?))'
+        params = [QUEUED, LEASED, now]
+        if shards:
+            query += f' AND shard IN ({",".join("?" * len(shards))})'
+            params += list(shards)
+        query += ' LIMIT ?'
+        params.append(count)
+        with self._write():
+            rows = self.conn.execute(query, params).fetchall()
+            self.conn.executemany(
+                'UPDATE work SET state = ?, owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?',
+                [(LEASED, owner, now + lease_seconds, row_id) for row_id, _url in rows],
+            )
+        return [url for _row_id, url in rows]
+
+    def renew(self, owner, lease_seconds):
+        """Extends the leases `owner` still holds."""
+        with self._write():
+            self.conn.execute('UPDATE work SET lease_expires = ? WHERE state = ? AND owner = ?',
+                              (time.time() + lease_seconds, LEASED, owner))
+
+    def complete(self, urls):
+        if not urls:
+            return
+        with self._write():
+            self.conn.executemany('UPDATE work SET state = ?, owner = NULL, lease_expires = NULL WHERE url = ?',
+                                  [(DONE, url) for url in urls])
+
+    def release(self, owner):
+        """Hands the unfinished leases of `owner` back to the queue."""
+        with self._write():
+            self.conn.execute('UPDATE work SET state = ?, owner = NULL, lease_expires = NULL WHERE state = ? AND owner = ?',
+                              (QUEUED, LEASED, owner))
+
+    def is_drained(self, owner=None):
+        """True once every URL is done (no queued work and no lease that could still expire).
+
+        Leases held by `owner` itself are not waited for.
+        """
+        if owner is None:
+            return self.conn.execute('SELECT 1 FROM work WHERE state != ? LIMIT 1', (DONE,)).fetchone() is None
+        return self.conn.execute('SELECT 1 FROM work WHERE state != ? AND (owner IS NULL OR owner != ?) LIMIT 1',
+                                 (DONE, owner)).fetchone() is None
+
+    def status(self):
+        """Counts per state, with leases that already expired counted separately."""
+        counts = {'queued': 0, 'leased': 0, 'expired': 0, 'done': 0}
+        names = {QUEUED: 'queued', LEASED: 'leased', DONE: 'done'}
+        for state, count in self.conn.execute('SELECT state, COUNT(*) FROM work GROUP BY state'):
+            counts[names[state]] = count
+        counts['expired'] = self.conn.execute(
+            'SELECT COUNT(*) FROM work WHERE state = ? AND lease_expires < ?', (LEASED, time.time())
+        ).fetchone()[0]
+        counts['leased'] -= counts['expired']
+        return counts
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,192 @@
+# make_fixtures.py
+#
+# Regenerates the synthetic page corpus used to check and benchmark the
+# extraction code (see benchmarks/). The pages follow the markup of LinkedIn's
+# public (logged-out) company and directory pages. Company pages cover the
+# field combinations the parser has to cope with: missing founded/specialties,
+# reordered details, missing top card, unknown labels...
+# `company_pages_expected.json` holds what the original selector-based
+# `parse_response` extracted from each page; extraction changes must keep
+# producing exactly that.
+#
+#   python fixtures/make_fixtures.py
+import os
+import random
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+COMPANY_DIR = os.path.join(HERE, 'company_pages')
+DIRECTORY_DIR = os.path.join(HERE, 'directory_pages')
+
+INDUSTRIES = ['Research Services', 'Software Development', 'IT Services and IT Consulting',
+              'Industrial Machinery Manufacturing', 'Financial Services', 'Retail',
+              'Hospitals and Health Care', 'Construction', 'Online Audio and Video Media']
+SIZES = ['1 employee', '2-10 employees', '11-50 employees', '51-200 employees', '201-500 employees',
+         '501-1,000 employees', '1,001-5,000 employees', '10,001+ employees']
+HEADQUARTERS = ['San Francisco, CA', 'Paris, Île-de-France', 'Lyon, Auvergne-Rhône-Alpes',
+                'London, England', 'Berlin, Berlin', 'New York, NY', 'Bangalore, Karnataka']
+TYPES = ['Privately Held', 'Public Company', 'Partnership', 'Nonprofit', 'Self-Employed',
+         'Government Agency']
+WORDS = ('data cloud platform research logistics energy design analytics services consulting '
+         'health finance education retail media security mobile robotics audio').split()
+
+
+def detail(label, value, link=False):
+    if link:
+        dd = (f'<dd class="font-sans text-md text-color-text break-all">\n'
+              f'          <a href="https://www.linkedin.com/redir/redirect?url={value}" class="link-no-visited-state"'
+              f' data-tracking-control-name="about_website">\n            {value}\n          </a>\n        </dd>')
+    else:
+        dd = f'<dd class="font-sans text-md text-color-text">\n          {value}\n        </dd>'
+    return (f'      <div class="mb-2" data-test-id="about-us__{label.lower().replace(" ", "-")}">\n'
+            f'        <dt class="mb-1 text-md font-bold text-color-text">\n          {label}\n        </dt>\n'
+            f'        {dd}\n      </div>\n')
+
+
+def filler(rng, n):
+    cards = []
+    for i in range(n):
+        name = ' '.join(rng.choice(WORDS).title() for _ in range(2))
+        cards.append(
+            f'<li><a class="base-card base-card--link base-aside-card" href="https://www.linkedin.com/company/{name.lower().replace(" ", "-")}{i}">'
+            f'<img class="artdeco-entity-image" data-delayed-url="https://media.licdn.com/dms/image/{i}/logo" alt="">'
+            f'<div class="base-aside-card__info"><h3 class="base-aside-card__title">{name}</h3>'
+            f'<p class="base-aside-card__subtitle">{rng.choice(INDUSTRIES)}</p>'
+            f'<p class="base-aside-card__second-subtitle">{rng.choice(HEADQUARTERS)}</p></div></a></li>')
+    return '\n'.join(cards)
+
+
+def company_page(rng, i):
+    name = f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}'
+    slug = name.lower().replace(' ', '-')
+    variant = i % 12
+    followers = f'{rng.randint(1, 3_000_000):,}'
+    details = [detail('Website', f'https://www.{slug}.com/', link=True)]
+    fields = [('Industry', rng.choice(INDUSTRIES)), ('Company size', rng.choice(SIZES)),
+              ('Headquarters', rng.choice(HEADQUARTERS)), ('Type', rng.choice(TYPES)),
+              ('Founded', str(rng.randint(1850, 2023))),
+              ('Specialties', ', '.join(rng.sample(WORDS, 4)) + ' and ' + rng.choice(WORDS))]
+    if variant == 1:    # no founded: specialties lands at index 5
+        del fields[4]
+    elif variant == 2:  # no specialties
+        del fields[5]
+    elif variant == 3:  # neither
+        del fields[4:]
+    elif variant == 4:  # no type: founded at index 4, specialties at 5
+        del fields[3]
+    elif variant == 5:  # unknown label in the founded/specialties slot
+        fields.insert(4, ('Locations', rng.choice(HEADQUARTERS)))
+    elif variant == 6:  # label without a value
+        fields[1] = ('Company size', '')
+    elif variant == 7:  # only a couple of details
+        fields = fields[:2]
+    elif variant == 8:  # shuffled order
+        rng.shuffle(fields)
+    details += [detail(label, value) for label, value in fields]
+    if variant == 9:
+        details = []
+
+    subline = (f'<h3 class="top-card-layout__first-subline font-sans text-md leading-open text-color-text-low-emphasis">\n'
+               f'        {fields[0][1] if fields else ""}\n'
+               f'        <span class="before:middot">{rng.choice(HEADQUARTERS)}</span>\n'
+               f'        {followers} followers\n      </h3>')
+    if variant == 10:
+        subline = '<h3 class="top-card-layout__first-subline font-sans text-md">No followers info</h3>'
+    title = f'<h1 class="top-card-layout__title font-sans text-lg papabear:text-xl font-bold">\n        {name}\n      </h1>'
+    if variant == 11 and i % 24 == 11:
+        title = ''  # profile that did not render: the spider skips it
+    employees = f'View all {rng.randint(1, 20000):,} employees' if variant != 7 else 'View all employees'
+    about = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 120)))
+
+    return f'''<!DOCTYPE html>
+<html lang="en">
+  <head>
+    <meta charset="utf-8">
+    <title>{name} | LinkedIn</title>
+    <meta name="description" content="{name} | {followers} followers on LinkedIn.">
+    <link rel="canonical" href="https://www.linkedin.com/company/{slug}">
+    <script type="application/ld+json">{{"@context":"http://schema.org","@type":"Organization","name":"{name}"}}</script>
+  </head>
+  <body dir="ltr" class="overflow-hidden">
+    <header class="header"><nav class="nav"><a class="nav__logo-link" href="https://www.linkedin.com/">LinkedIn</a></nav></header>
+    <main class="main papabear:flex" id="main-content" role="main">
+      <section class="top-card-layout container-lined overflow-hidden babybear:rounded-[0px]">
+        <figure class="cover-img"><img class="cover-img__image" data-delayed-url="https://media.licdn.com/dms/image/{i}/cover" alt=""></figure>
+        <div class="top-card-layout__card relative p-2 papabear:p-details-container-padding">
+          <div class="top-card-layout__entity-image-container flex">
+            <img class="top-card-layout__entity-image top-card__profile-image" data-delayed-url="https://media.licdn.com/dms/image/{i}/company-logo_200_200/0/{slug}_logo?e=2147483647&amp;v=beta" alt="{name}">
+          </div>
+          <div class="top-card-layout__entity-info-container flex flex-wrap papabear:flex-nowrap">
+            <div class="top-card-layout__entity-info flex-grow flex-shrink-0 basis-0 babybear:flex-none">
+      {title}
+      <h4 class="top-card-layout__second-subline font-sans text-sm leading-open text-color-text-low-emphasis mt-0.5">
+        {' '.join(rng.choice(WORDS) for _ in range(8))}
+      </h4>
+      {subline}
+            </div>
+          </div>
+        </div>
+      </section>
+      <section class="core-section-container my-3">
+        <h2 class="core-section-container__title section-title">About us</h2>
+        <div class="core-section-container__content break-words">
+          <p class="break-words whitespace-pre-wrap text-color-text" data-test-id="about-us__description">{about}</p>
+          <dl class="mt-6">
+{''.join(details)}          </dl>
+        </div>
+      </section>
+      <section class="core-section-container my-3 employees">
+        <h2 class="core-section-container__title section-title">Employees at {name}</h2>
+        <div class="face-pile flex">
+          <p class="face-pile__text font-sans text-md">{employees}</p>
+        </div>
+      </section>
+      <section class="aside-section-container mb-4">
+        <h2 class="aside-section-container__title section-title">Similar pages</h2>
+        <ul class="show-more-less__list">
+{filler(rng, rng.randint(40, 160))}
+        </ul>
+      </section>
+    </main>
+    <footer class="li-footer"><small>LinkedIn &copy; 2024</small></footer>
+  </body>
+</html>
+'''
+
+
+def directory_page(rng, letter, n):
+    entries = '\n'.join(
+        f'<li class="listings__entry"><a class="listings__entry-link" href="https://www.linkedin.com/company/{letter}{w}-{k}?trk=companies_directory">'
+        f'{letter.upper()}{w.title()} {k}</a></li>'
+        for k, w in ((k, rng.choice(WORDS)) for k in range(n)))
+    links = '\n'.join(
+        f'<li><a class="pagination-links" href="https://www.linkedin.com/directory/companies/{c}?trk=companies_directory_letter_nav">{c.upper()}</a></li>'
+        for c in 'abcdefghijklmnopqrstuvwxyz')
+    return f'''<!DOCTYPE html>
+<html lang="en">
+  <head><meta charset="utf-8"><title>Companies Directory | LinkedIn</title></head>
+  <body>
+    <main class="directory">
+      <ul class="pagination">{links}</ul>
+      <ul class="listings">
+{entries}
+      </ul>
+    </main>
+  </body>
+</html>
+'''
+
+
+def main():
+    rng = random.Random(1234)
+    os.makedirs(COMPANY_DIR, exist_ok=True)
+    os.makedirs(DIRECTORY_DIR, exist_ok=True)
+    for i in range(48):
+        with open(os.path.join(COMPANY_DIR, f'company_{i:03d}.html'), 'w', encoding='utf-8') as f:
+            f.write(company_page(rng, i))
+    for letter in 'abcdef':
+        with open(os.path.join(DIRECTORY_DIR, f'directory_{letter}.html'), 'w', encoding='utf-8') as f:
+            f.write(directory_page(rng, letter, rng.randint(200, 600)))
+
+
+if __name__ == '__main__':
+    main()
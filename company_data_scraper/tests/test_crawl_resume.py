@@ -0,0 +1,89 @@
+import json
+import os
+import signal
+import subprocess
+import time
+
+import pytest
+
+from benchmarks.bench_crawl import _scrapy
+from benchmarks.standin_server import StandinServer
+from company_data_scraper import settings as project_settings
+from company_data_scraper.storage import iter_records
+
+COMPANIES = 40
+
+
+@pytest.fixture
+def server():
+    server = StandinServer(latency_ms=150).start()
+    yield server
+    server.stop()
+
+
+def _settings(server, workdir):
+    return {
+        'STANDIN_URL': server.base_url,
+        'DOWNLOADER_MIDDLEWARES': json.dumps(dict(project_settings.DOWNLOADER_MIDDLEWARES, **{
+            'benchmarks.standin_server.RewriteToStandinMiddleware': 50,
+        })),
+        'RATE_BUDGET_RPS': 0,
+        'CONCURRENT_REQUESTS': 2,
+        'PROFILE_FLUSH_INTERVAL': 0.2,
+        'INPUT_CURSOR_SAVE_EVERY': 1,
+        'REFRESH_INITIAL_DAYS': 0,
+        'RETRY_QUEUE_MAX_WAIT': 0,  # pages without a company (some fixtures) are left for later
+        # a filter that outlives the run, as with JOBDIR
+        'DUPEFILTER_PATH': os.path.join(workdir, 'requests.bloom'),
+        'LOG_LEVEL': 'ERROR',
+    }
+
+
+def _companies(workdir):
+    return {record['company_url'] for record in iter_records(os.path.join(workdir, 'company_profile_data'))}
+
+
+def _crawl(workdir, settings, *arguments):
+    command, env = _scrapy(['crawl', 'company_profile_scraper', *arguments], settings)
+    return subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True, timeout=300)
+
+
+def _workdir(path):
+    os.makedirs(path)
+    with open(os.path.join(path, 'company_ids.csv'), 'w') as f:
+        for i in range(COMPANIES):
+            f.write(f'"resume-company-{i}"\n')
+    return str(path)
+
+
+def test_resume_after_kill_and_refresh_with_persisted_dupefilter(server, tmp_path):
+    # the companies an uninterrupted crawl writes
+    baseline = _workdir(tmp_path / 'baseline')
+    assert _crawl(baseline, _settings(server, baseline)).returncode == 0
+    expected = _companies(baseline)
+    assert expected
+
+    workdir = _workdir(tmp_path / 'crashed')
+    settings = _settings(server, workdir)
+
+    command, env = _scrapy(['crawl', 'company_profile_scraper'], settings)
+    proc = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 120
+    while len(_companies(workdir)) < 5 and time.monotonic() < deadline and proc.poll() is None:
+        time.sleep(0.1)
+    proc.send_signal(signal.SIGKILL)
+    proc.wait()
+    assert 0 < len(_companies(workdir)) < len(expected)
+
+    resumed = _crawl(workdir, settings)
+    assert resumed.returncode == 0, resumed.stderr
+    assert _companies(workdir) == expected
+    with open(os.path.join(workdir, 'input_cursor.json')) as f:
+        cursor = json.load(f)['company_ids.csv']
+    assert cursor['rows'] == COMPANIES
+
+    server.status_counts.clear()
+    refreshed = _crawl(workdir, settings, '-a', 'refresh=1')
+    assert refreshed.returncode == 0, refreshed.stderr
+    assert sum(server.status_counts.values()) >= len(expected)
+    assert f'Refreshed {len(expected)} of {len(expected)} due URLs' in refreshed.stdout
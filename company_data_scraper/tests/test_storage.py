@@ -0,0 +1,44 @@
+import shutil
+
+from company_data_scraper.storage import JsonlShardWriter, iter_shard_records, list_shards
+
+
+def _flushed_copy(tmp_path, count, compression):
+    # a shard flushed but never closed, as a crash leaves it
+    writer = JsonlShardWriter(str(tmp_path / 'out'), compression=compression, flush_interval=1e9)
+    for i in range(count):
+        writer.write({'company_url': f'https://www.linkedin.com/company/c{i}/', 'about_us': 'x' * (i % 300)})
+    writer.flush()
+    copy = tmp_path / ('copy' + writer.suffix)
+    shutil.copy(list_shards(writer.directory)[0], copy)
+    writer.close()
+    return str(copy)
+
+
+def test_flushed_unclosed_gzip_shard_reads_back_every_item(tmp_path):
+    path = _flushed_copy(tmp_path, 20_000, 'gzip')
+    records = list(iter_shard_records(path))
+    assert len(records) == 20_000
+    assert records[-1]['company_url'] == 'https://www.linkedin.com/company/c19999/'
+
+
+def test_small_flushed_unclosed_gzip_shard(tmp_path):
+    assert len(list(iter_shard_records(_flushed_copy(tmp_path, 50, 'gzip')))) == 50
+
+
+def test_truncated_gzip_shard_keeps_the_items_before_the_cut(tmp_path):
+    path = _flushed_copy(tmp_path, 5_000, 'gzip')
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:len(data) // 2])
+    records = list(iter_shard_records(path))
+    assert 0 < len(records) < 5_000
+    assert [r['company_url'] for r in records] == [f'https://www.linkedin.com/company/c{i}/' for i in range(len(records))]
+
+
+def test_partial_last_line_is_dropped(tmp_path):
+    path = _flushed_copy(tmp_path, 10, None)
+    with open(path, 'ab') as f:
+        f.write(b'{"company_url": "https://www.linkedin.com/comp')
+    assert len(list(iter_shard_records(path))) == 10